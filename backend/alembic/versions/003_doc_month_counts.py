@@ -0,0 +1,33 @@
+"""Materialized per-month document counts for the dashboard.
+
+Revision ID: 003_doc_month_counts
+Revises: 002_tune_hnsw_index
+Create Date: 2024-02-01 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "003_doc_month_counts"
+down_revision: Union[str, None] = "002_tune_hnsw_index"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # to_char() on timestamptz is not immutable, so it cannot back an expression
+    # index; precompute the grouping instead and refresh it on writes.
+    op.execute("""
+        CREATE MATERIALIZED VIEW doc_month_counts AS
+        SELECT to_char(added_date, 'YYYY-MM') AS month, count(*) AS count
+        FROM documents
+        GROUP BY 1
+    """)
+    # Required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+    op.execute("CREATE UNIQUE INDEX ix_doc_month_counts_month ON doc_month_counts (month)")
+
+
+def downgrade() -> None:
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS doc_month_counts")
@@ -0,0 +1,36 @@
+"""Store the full-text search vector in a generated column.
+
+Revision ID: 004_content_tsv
+Revises: 003_doc_month_counts
+Create Date: 2024-02-01 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "004_content_tsv"
+down_revision: Union[str, None] = "003_doc_month_counts"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The tsvector is computed once per write instead of on every search, and
+    # queries hit the index regardless of how the expression is spelled.
+    op.execute("""
+        ALTER TABLE documents
+        ADD COLUMN content_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', COALESCE(content, ''))) STORED
+    """)
+    op.execute("DROP INDEX IF EXISTS ix_documents_content_fts")
+    op.execute("CREATE INDEX ix_documents_content_tsv ON documents USING gin (content_tsv)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_documents_content_tsv")
+    op.execute("ALTER TABLE documents DROP COLUMN IF EXISTS content_tsv")
+    op.execute(
+        "CREATE INDEX ix_documents_content_fts ON documents USING gin (to_tsvector('english', COALESCE(content, '')))"
+    )
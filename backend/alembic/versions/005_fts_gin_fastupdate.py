@@ -0,0 +1,33 @@
+"""Turn off the GIN pending list on the full-text index.
+
+Revision ID: 005_fts_gin_fastupdate
+Revises: 004_content_tsv
+Create Date: 2024-02-01 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "005_fts_gin_fastupdate"
+down_revision: Union[str, None] = "004_content_tsv"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Profile choice:
+    # - fastupdate = off (chosen): each document's text is written once by the
+    #   worker and then searched many times, so pay the GIN insert cost up
+    #   front and never make a search scan an unmerged pending list.
+    # - fastupdate = on, gin_pending_list_limit = '4MB': only worth it for
+    #   bulk re-ingestion where insert throughput matters more than search
+    #   latency; pair it with a periodic gin_clean_pending_list() call.
+    op.execute("ALTER INDEX ix_documents_content_tsv SET (fastupdate = off)")
+    # Merge whatever was already queued; turning fastupdate off does not flush it
+    op.execute("SELECT gin_clean_pending_list('ix_documents_content_tsv'::regclass)")
+
+
+def downgrade() -> None:
+    op.execute("ALTER INDEX ix_documents_content_tsv RESET (fastupdate)")
@@ -0,0 +1,26 @@
+"""Index chat history by creation time.
+
+Revision ID: 006_chat_history_created_at
+Revises: 005_fts_gin_fastupdate
+Create Date: 2024-02-01 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "006_chat_history_created_at"
+down_revision: Union[str, None] = "005_fts_gin_fastupdate"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The history endpoint reads the newest N rows; walk the index instead of
+    # sorting the whole table on every call.
+    op.execute("CREATE INDEX ix_chat_history_created_at ON chat_history (created_at DESC)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_chat_history_created_at")
@@ -0,0 +1,46 @@
+"""Store document embeddings as halfvec.
+
+Revision ID: 007_embedding_halfvec
+Revises: 006_chat_history_created_at
+Create Date: 2024-02-01 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "007_embedding_halfvec"
+down_revision: Union[str, None] = "006_chat_history_created_at"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # FP16 halves the row and graph size (768 vs 1536 bytes per embedding), so
+    # HNSW traversal moves half the memory. Requires pgvector >= 0.7.
+    op.execute("SET maintenance_work_mem = '2GB'")
+    op.execute("SET max_parallel_maintenance_workers = 7")
+
+    op.execute("DROP INDEX IF EXISTS ix_documents_embedding_hnsw")
+    op.execute(
+        "ALTER TABLE documents ALTER COLUMN embedding TYPE halfvec(384) USING embedding::halfvec(384)"
+    )
+    op.execute(
+        "CREATE INDEX ix_documents_embedding_hnsw ON documents "
+        "USING hnsw (embedding halfvec_cosine_ops) WITH (m = 24, ef_construction = 128)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("SET maintenance_work_mem = '2GB'")
+    op.execute("SET max_parallel_maintenance_workers = 7")
+
+    op.execute("DROP INDEX IF EXISTS ix_documents_embedding_hnsw")
+    op.execute(
+        "ALTER TABLE documents ALTER COLUMN embedding TYPE vector(384) USING embedding::vector(384)"
+    )
+    op.execute(
+        "CREATE INDEX ix_documents_embedding_hnsw ON documents "
+        "USING hnsw (embedding vector_cosine_ops) WITH (m = 24, ef_construction = 128)"
+    )
@@ -0,0 +1,29 @@
+"""Collect detailed planner statistics for the full-text column.
+
+Revision ID: 009_content_tsv_statistics
+Revises: 008_embedding_hnsw_done
+Create Date: 2024-02-01 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "009_content_tsv_statistics"
+down_revision: Union[str, None] = "008_embedding_hnsw_done"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # tsvector columns get a most-common-elements list; the default target of
+    # 100 leaves frequent OCR terms out of it, so the planner badly misjudges
+    # how selective "common AND rare" queries are and skips the GIN index.
+    op.execute("ALTER TABLE documents ALTER COLUMN content_tsv SET STATISTICS 1000")
+    # Populate the statistics now rather than waiting for autovacuum
+    op.execute("ANALYZE documents")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE documents ALTER COLUMN content_tsv SET STATISTICS -1")
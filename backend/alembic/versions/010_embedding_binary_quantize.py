@@ -0,0 +1,34 @@
+"""Binary-quantized HNSW index for coarse embedding search.
+
+Revision ID: 010_embedding_binary_quantize
+Revises: 009_content_tsv_statistics
+Create Date: 2024-02-01 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "010_embedding_binary_quantize"
+down_revision: Union[str, None] = "009_content_tsv_statistics"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # One bit per dimension (48 bytes per row instead of 768): the graph stays
+    # cache-resident and Hamming distance is a popcount. Only used when
+    # BINARY_QUANTIZE_SEARCH is on, which reranks its candidates by cosine.
+    op.execute("SET maintenance_work_mem = '2GB'")
+    op.execute("SET max_parallel_maintenance_workers = 7")
+    op.execute(
+        "CREATE INDEX ix_documents_embedding_bq_hnsw ON documents "
+        "USING hnsw ((binary_quantize(embedding)::bit(384)) bit_hamming_ops) "
+        "WITH (m = 24, ef_construction = 128) "
+        "WHERE status = 'done'"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_documents_embedding_bq_hnsw")
@@ -0,0 +1,33 @@
+"""Composite (status, added_date DESC) index covering the type and correspondent.
+
+Revision ID: 011_documents_status_added_date
+Revises: 010_embedding_binary_quantize
+Create Date: 2024-02-01 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "011_documents_status_added_date"
+down_revision: Union[str, None] = "010_embedding_binary_quantize"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Status filters come back already ordered newest first, and the INCLUDE
+    # columns let per-status counts and type/correspondent breakdowns run as
+    # index-only scans.
+    op.execute(
+        "CREATE INDEX ix_documents_status_added_date ON documents "
+        "(status, added_date DESC) INCLUDE (document_type_id, correspondent_id)"
+    )
+    # status is the leading column above, so the single-column index is redundant
+    op.execute("DROP INDEX IF EXISTS ix_documents_status")
+
+
+def downgrade() -> None:
+    op.execute("CREATE INDEX ix_documents_status ON documents (status)")
+    op.execute("DROP INDEX IF EXISTS ix_documents_status_added_date")
@@ -0,0 +1,27 @@
+"""Index document_tags by tag.
+
+Revision ID: 012_document_tags_tag_id
+Revises: 011_documents_status_added_date
+Create Date: 2024-02-01 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "012_document_tags_tag_id"
+down_revision: Union[str, None] = "011_documents_status_added_date"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The primary key leads with document_id, so filtering documents by tag
+    # and the ON DELETE CASCADE from tags both scanned the whole table. With
+    # document_id as the second key column the tag filter is index-only.
+    op.execute("CREATE INDEX ix_document_tags_tag_id ON document_tags (tag_id, document_id)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_document_tags_tag_id")
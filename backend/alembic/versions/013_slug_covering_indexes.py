@@ -0,0 +1,41 @@
+"""Covering unique slug indexes for tags, correspondents and document types.
+
+Revision ID: 013_slug_covering_indexes
+Revises: 012_document_tags_tag_id
+Create Date: 2024-02-01 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "013_slug_covering_indexes"
+down_revision: Union[str, None] = "012_document_tags_tag_id"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> columns carried in the index leaf pages
+COVERED = {
+    "tags": "id, name, color",
+    "correspondents": "id, name",
+    "document_types": "id, name",
+}
+
+
+def upgrade() -> None:
+    # 001 gave each slug both a UNIQUE constraint and a plain index. One
+    # unique index that also carries the row's columns replaces the pair:
+    # slug lookups become index-only scans, and ON CONFLICT (slug) still
+    # infers it as its arbiter.
+    for table, include in COVERED.items():
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_slug")
+        op.execute(f"CREATE UNIQUE INDEX ix_{table}_slug ON {table} (slug) INCLUDE ({include})")
+        op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_slug_key")
+
+
+def downgrade() -> None:
+    for table in COVERED:
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_slug_key UNIQUE (slug)")
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_slug")
+        op.execute(f"CREATE INDEX ix_{table}_slug ON {table} (slug)")
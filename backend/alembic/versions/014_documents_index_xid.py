@@ -0,0 +1,46 @@
+"""Stamp documents with the id of the transaction that last wrote them.
+
+Revision ID: 014_documents_index_xid
+Revises: 013_slug_covering_indexes
+Create Date: 2024-02-01 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "014_documents_index_xid"
+down_revision: Union[str, None] = "013_slug_covering_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # modified_date is taken before the writing transaction commits, so
+    # commits can land out of timestamp order and a timestamp watermark can
+    # skip rows. A 64-bit transaction id can be compared against a snapshot's
+    # xmin instead: every transaction below it has finished.
+    op.execute("ALTER TABLE documents ADD COLUMN index_xid xid8 NOT NULL DEFAULT pg_current_xact_id()")
+    op.execute("CREATE INDEX ix_documents_index_xid ON documents (index_xid)")
+    op.execute(
+        """
+        CREATE FUNCTION documents_stamp_index_xid() RETURNS trigger AS $$
+        BEGIN
+            NEW.index_xid := pg_current_xact_id();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER documents_stamp_index_xid BEFORE UPDATE ON documents "
+        "FOR EACH ROW EXECUTE FUNCTION documents_stamp_index_xid()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS documents_stamp_index_xid ON documents")
+    op.execute("DROP FUNCTION IF EXISTS documents_stamp_index_xid()")
+    op.execute("DROP INDEX IF EXISTS ix_documents_index_xid")
+    op.execute("ALTER TABLE documents DROP COLUMN IF EXISTS index_xid")
@@ -1,20 +1,21 @@
 from __future__ import annotations
 
-import json
 import logging
 import os
 import shutil
 import subprocess
 import uuid
 from datetime import datetime
-from pathlib import Path
+from stat import S_ISREG
 from typing import List, Optional
 
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy import select, func
+from sqlalchemy import Text, cast, func, literal_column, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import noload, selectinload
 
 from app.config import get_settings
 from app.database import get_db
@@ -32,6 +33,7 @@ logger = logging.getLogger(__name__)
 settings = get_settings()
 
 BACKUP_DIR = os.environ.get("DOCUAI_BACKUP_DIR", "/data/backups")
+BACKUP_SUFFIXES = (".gz", ".dump", ".json", ".zip")
 
 
 class BackupInfo(BaseModel):
@@ -71,28 +73,35 @@ async def list_backups():
     backups = []
     total_size = 0
 
-    for f in sorted(Path(BACKUP_DIR).iterdir(), key=lambda x: x.stat().st_mtime, reverse=True):
-        if f.is_file() and (f.suffix in (".gz", ".dump", ".json", ".zip")):
-            stat = f.stat()
-            total_size += stat.st_size
-
-            # Detect type from filename
-            btype = "unknown"
-            if f.name.startswith("full_"):
-                btype = "full"
-            elif f.name.startswith("db_"):
-                btype = "database"
-            elif f.name.startswith("files_"):
-                btype = "files"
-            elif f.name.startswith("export_"):
-                btype = "export"
-
-            backups.append(BackupInfo(
-                filename=f.name,
-                type=btype,
-                size=stat.st_size,
-                created_at=datetime.fromtimestamp(stat.st_mtime).isoformat(),
-            ))
+    # DirEntry caches its stat, so each file costs one syscall
+    with os.scandir(BACKUP_DIR) as it:
+        entries = [
+            (e.name, e.stat())
+            for e in it
+            if e.name.endswith(BACKUP_SUFFIXES) and e.is_file()
+        ]
+    entries.sort(key=lambda item: item[1].st_mtime, reverse=True)
+
+    for name, st in entries:
+        total_size += st.st_size
+
+        # Detect type from filename
+        btype = "unknown"
+        if name.startswith("full_"):
+            btype = "full"
+        elif name.startswith("db_"):
+            btype = "database"
+        elif name.startswith("files_"):
+            btype = "files"
+        elif name.startswith("export_"):
+            btype = "export"
+
+        backups.append(BackupInfo(
+            filename=name,
+            type=btype,
+            size=st.st_size,
+            created_at=datetime.fromtimestamp(st.st_mtime).isoformat(),
+        ))
 
     return BackupListResponse(
         backups=backups,
@@ -101,52 +110,79 @@ async def list_backups():
     )
 
 
+def _export_documents_query():
+    """One JSON object per document, assembled by Postgres in a single query."""
+    tags_json = (
+        select(func.coalesce(func.json_agg(Tag.name), literal_column("'[]'::json")))
+        .select_from(DocumentTag)
+        .join(Tag, Tag.id == DocumentTag.tag_id)
+        .where(DocumentTag.document_id == Document.id)
+        .scalar_subquery()
+    )
+    custom_fields_json = (
+        select(func.coalesce(
+            func.json_agg(func.json_build_object(
+                "name", CustomField.field_name,
+                "value", CustomField.field_value,
+                "type", CustomField.field_type,
+            )),
+            literal_column("'[]'::json"),
+        ))
+        .where(CustomField.document_id == Document.id)
+        .scalar_subquery()
+    )
+    doc_json = func.json_build_object(
+        "id", Document.id,
+        "title", Document.title,
+        "original_filename", Document.original_filename,
+        "content", Document.content,
+        "file_path", Document.file_path,
+        "status", Document.status,
+        "mime_type", Document.mime_type,
+        "page_count", Document.page_count,
+        "file_size", Document.file_size,
+        "created_date", Document.created_date,
+        "added_date", Document.added_date,
+        "modified_date", Document.modified_date,
+        "document_type", DocumentType.name,
+        "correspondent", Correspondent.name,
+        "tags", tags_json,
+        "custom_fields", custom_fields_json,
+    )
+    return (
+        select(cast(doc_json, Text))
+        .select_from(Document)
+        .outerjoin(DocumentType, DocumentType.id == Document.document_type_id)
+        .outerjoin(Correspondent, Correspondent.id == Document.correspondent_id)
+        .order_by(Document.added_date)
+    )
+
+
 @router.post("/export-json")
 async def export_documents_json(db: AsyncSession = Depends(get_db)):
     """Export all document metadata as a downloadable JSON file."""
     os.makedirs(BACKUP_DIR, exist_ok=True)
 
-    result = await db.execute(
-        select(Document).order_by(Document.added_date)
-    )
-    docs = result.scalars().all()
-
-    export_data = []
-    for doc in docs:
-        export_data.append({
-            "id": str(doc.id),
-            "title": doc.title,
-            "original_filename": doc.original_filename,
-            "content": doc.content,
-            "file_path": doc.file_path,
-            "status": doc.status.value if hasattr(doc.status, "value") else str(doc.status),
-            "mime_type": doc.mime_type,
-            "page_count": doc.page_count,
-            "file_size": doc.file_size,
-            "created_date": doc.created_date.isoformat() if doc.created_date else None,
-            "added_date": doc.added_date.isoformat() if doc.added_date else None,
-            "modified_date": doc.modified_date.isoformat() if doc.modified_date else None,
-            "document_type": doc.document_type.name if doc.document_type else None,
-            "correspondent": doc.correspondent.name if doc.correspondent else None,
-            "tags": [t.name for t in doc.tags],
-            "custom_fields": [
-                {"name": cf.field_name, "value": cf.field_value, "type": cf.field_type}
-                for cf in doc.custom_fields
-            ],
-        })
+    # Server-side cursor: only one batch of rows is held in memory at a time
+    result = await db.stream(_export_documents_query().execution_options(yield_per=1000))
 
     # Save to file
     timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     filename = f"export_{timestamp}.json"
     filepath = os.path.join(BACKUP_DIR, filename)
 
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump({
-            "version": "1.0.0",
-            "exported_at": datetime.utcnow().isoformat(),
-            "document_count": len(export_data),
-            "documents": export_data,
-        }, f, indent=2, ensure_ascii=False)
+    # Rows arrive as ready-made JSON text; write them through in batches and
+    # record the count once every document has been written.
+    header = orjson.dumps({"version": "1.0.0", "exported_at": datetime.utcnow().isoformat()})
+    document_count = 0
+    with open(filepath, "wb", buffering=1 << 20) as f:
+        f.write(header[:-1] + b',"documents":[')
+        async for batch in result.scalars().partitions():
+            if document_count:
+                f.write(b",")
+            f.write(",".join(batch).encode("utf-8"))
+            document_count += len(batch)
+        f.write(b'],"document_count":%d}' % document_count)
 
     return FileResponse(
         path=filepath,
@@ -162,13 +198,19 @@ async def download_backup(filename: str):
     safe_name = os.path.basename(filename)
     filepath = os.path.join(BACKUP_DIR, safe_name)
 
-    if not os.path.isfile(filepath):
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        st = None
+    if st is None or not S_ISREG(st.st_mode):
         raise HTTPException(status_code=404, detail="Backup file not found")
 
+    # Reuse the stat so FileResponse sets Content-Length without a second syscall
     return FileResponse(
         path=filepath,
         filename=safe_name,
         media_type="application/octet-stream",
+        stat_result=st,
     )
 
 
@@ -185,13 +227,23 @@ async def delete_backup(filename: str):
     return {"detail": f"Deleted {safe_name}"}
 
 
-@router.get("/export-document/{doc_id}")
+@router.get("/export-document/{doc_id}", response_class=ORJSONResponse)
 async def export_single_document(
     doc_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
 ):
     """Export a single document (metadata + original file) as JSON."""
-    result = await db.execute(select(Document).where(Document.id == doc_id))
+    result = await db.execute(
+        select(Document)
+        .options(
+            selectinload(Document.document_type),
+            selectinload(Document.correspondent),
+            selectinload(Document.tags),
+            selectinload(Document.custom_fields),
+            noload(Document.processing_logs),
+        )
+        .where(Document.id == doc_id)
+    )
     doc = result.scalar_one_or_none()
     if doc is None:
         raise HTTPException(status_code=404, detail="Document not found")
@@ -215,4 +267,4 @@ async def export_single_document(
         ],
     }
 
-    return export
+    return ORJSONResponse(export)
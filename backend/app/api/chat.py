@@ -3,11 +3,13 @@ from __future__ import annotations
 import logging
 from typing import List
 
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import async_session_factory, get_db
 from app.models import ChatHistory
 from app.schemas import ChatHistoryResponse, ChatRequest, ChatResponse
 
@@ -41,6 +43,44 @@ async def chat(body: ChatRequest, db: AsyncSession = Depends(get_db)):
     )
 
 
+def _sse(event: dict) -> bytes:
+    return b"data: " + orjson.dumps(event) + b"\n\n"
+
+
+@router.post("/stream")
+async def chat_stream(body: ChatRequest, db: AsyncSession = Depends(get_db)):
+    """Server-sent events: the sources, then answer tokens as Ollama produces them."""
+    from app.services.rag import RAGService
+
+    rag = RAGService()
+    try:
+        retrieval = await rag.retrieve(body.question, db)
+    except Exception as e:
+        logger.exception("RAG service error")
+        raise HTTPException(status_code=500, detail=f"AI service error: {str(e)}")
+
+    sources = [s.model_dump(mode="json") for s in retrieval.sources]
+
+    async def events():
+        yield _sse({"type": "sources", "sources": sources})
+        parts: list[str] = []
+        async for token in rag.stream_answer(body.question, retrieval):
+            parts.append(token)
+            yield _sse({"type": "token", "text": token})
+
+        # The request session is already closed once the body streams
+        async with async_session_factory() as session:
+            session.add(ChatHistory(question=body.question, answer="".join(parts), sources=sources))
+            await session.commit()
+        yield _sse({"type": "done"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/history", response_model=List[ChatHistoryResponse])
 async def get_chat_history(
     limit: int = Query(50, ge=1, le=200),
@@ -1,27 +1,20 @@
 from __future__ import annotations
 
-import re
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models import Correspondent
 from app.schemas import CorrespondentCreate, CorrespondentResponse, CorrespondentUpdate
+from app.utils.slug import slugify
 
 router = APIRouter(prefix="/correspondents", tags=["correspondents"])
 
 
-def _slugify(name: str) -> str:
-    slug = name.lower().strip()
-    slug = re.sub(r"[^\w\s-]", "", slug)
-    slug = re.sub(r"[\s_]+", "-", slug)
-    slug = re.sub(r"-+", "-", slug).strip("-")
-    return slug
-
-
 @router.get("/", response_model=List[CorrespondentResponse])
 async def list_correspondents(db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(Correspondent).order_by(Correspondent.name))
@@ -30,15 +23,17 @@ async def list_correspondents(db: AsyncSession = Depends(get_db)):
 
 @router.post("/", response_model=CorrespondentResponse, status_code=status.HTTP_201_CREATED)
 async def create_correspondent(data: CorrespondentCreate, db: AsyncSession = Depends(get_db)):
-    slug = _slugify(data.name)
-    existing = await db.execute(select(Correspondent).where(Correspondent.slug == slug))
-    if existing.scalar_one_or_none():
+    slug = slugify(data.name)
+    # Single atomic round-trip; a concurrent insert of the same slug yields no row
+    stmt = (
+        pg_insert(Correspondent)
+        .values(name=data.name, slug=slug)
+        .on_conflict_do_nothing(index_elements=["slug"])
+        .returning(Correspondent)
+    )
+    corr = await db.scalar(stmt)
+    if corr is None:
         raise HTTPException(status_code=409, detail=f"Correspondent '{data.name}' already exists")
-
-    corr = Correspondent(name=data.name, slug=slug)
-    db.add(corr)
-    await db.flush()
-    await db.refresh(corr)
     return corr
 
 
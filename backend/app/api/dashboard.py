@@ -1,12 +1,13 @@
 from __future__ import annotations
 
-import os
+from typing import List
 
 from fastapi import APIRouter, Depends
-from sqlalchemy import func, select, extract
+from pydantic import TypeAdapter
+from sqlalchemy import BigInteger, String, cast, column, extract, func, literal, select, table, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 
-from app.config import get_settings
 from app.database import get_db
 from app.models import Document, DocumentStatus, DocumentType
 from app.schemas import (
@@ -18,68 +19,80 @@ from app.schemas import (
 )
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
-settings = get_settings()
 
+# Materialized view maintained by migration 003 and refreshed by the worker
+doc_month_counts = table(
+    "doc_month_counts",
+    column("month", String),
+    column("count", BigInteger),
+)
 
-def _dir_size(path: str) -> int:
-    total = 0
-    if not os.path.exists(path):
-        return 0
-    for dirpath, _dirnames, filenames in os.walk(path):
-        for f in filenames:
-            fp = os.path.join(dirpath, f)
-            if os.path.isfile(fp):
-                total += os.path.getsize(fp)
-    return total
+# Built once at import; validates the whole recent list in a single call
+_recent_adapter = TypeAdapter(List[DocumentListResponse])
 
 
 @router.get("/stats", response_model=DashboardStats)
 async def get_stats(db: AsyncSession = Depends(get_db)):
-    # Total documents
-    total_result = await db.execute(select(func.count(Document.id)))
-    total_documents = total_result.scalar() or 0
-
-    # By status
-    status_result = await db.execute(
-        select(Document.status, func.count(Document.id))
-        .group_by(Document.status)
-    )
-    by_status = [
-        StatusCount(status=str(row[0].value) if hasattr(row[0], 'value') else str(row[0]), count=row[1])
-        for row in status_result.all()
-    ]
-
-    # By type
-    type_result = await db.execute(
-        select(DocumentType.name, func.count(Document.id))
+    # All counters in a single round-trip; every branch yields (kind, key, count)
+    type_counts = (
+        select(DocumentType.name.label("key"), func.count(Document.id).label("n"))
         .join(Document, Document.document_type_id == DocumentType.id)
         .group_by(DocumentType.name)
         .order_by(func.count(Document.id).desc())
         .limit(10)
+        .subquery()
     )
-    by_type = [TypeCount(name=row[0], count=row[1]) for row in type_result.all()]
-
-    # By month (last 12 months)
-    month_result = await db.execute(
-        select(
-            func.to_char(Document.added_date, "YYYY-MM").label("month"),
-            func.count(Document.id),
-        )
-        .group_by(func.to_char(Document.added_date, "YYYY-MM"))
-        .order_by(func.to_char(Document.added_date, "YYYY-MM").desc())
+    month_counts = (
+        select(doc_month_counts.c.month.label("key"), doc_month_counts.c.count.label("n"))
+        .order_by(doc_month_counts.c.month.desc())
         .limit(12)
+        .subquery()
     )
-    by_month = [MonthCount(month=row[0], count=row[1]) for row in month_result.all()]
+    stats_result = await db.execute(union_all(
+        select(literal("total"), literal(""), func.count(Document.id)),
+        select(literal("storage"), literal(""), func.coalesce(func.sum(Document.file_size), 0)),
+        select(literal("status"), cast(Document.status, String), func.count(Document.id))
+        .group_by(Document.status),
+        select(literal("type"), type_counts.c.key, type_counts.c.n),
+        select(literal("month"), month_counts.c.key, month_counts.c.n),
+    ))
+
+    total_documents = 0
+    storage_used = 0
+    by_status: list[StatusCount] = []
+    by_type: list[TypeCount] = []
+    by_month: list[MonthCount] = []
+    for kind, key, count in stats_result.all():
+        count = int(count or 0)
+        if kind == "total":
+            total_documents = count
+        elif kind == "storage":
+            # Original files; sizes are recorded at ingest
+            storage_used = count
+        elif kind == "status":
+            by_status.append(StatusCount(status=key, count=count))
+        elif kind == "type":
+            by_type.append(TypeCount(name=key, count=count))
+        elif kind == "month":
+            by_month.append(MonthCount(month=key, count=count))
+
+    # UNION ALL does not preserve the branches' ordering
+    by_type.sort(key=lambda t: t.count, reverse=True)
+    by_month.sort(key=lambda m: m.month, reverse=True)
 
     # Recent documents
     recent_result = await db.execute(
-        select(Document).order_by(Document.added_date.desc()).limit(10)
+        select(Document)
+        .options(
+            selectinload(Document.tags),
+            joinedload(Document.document_type),
+            joinedload(Document.correspondent),
+        )
+        .order_by(Document.added_date.desc())
+        .limit(10)
     )
     recent_docs = recent_result.scalars().all()
-    recent_documents = [DocumentListResponse.model_validate(d) for d in recent_docs]
-
-    # Storage used
-    storage_used = _dir_size(settings.MEDIA_DIR) + _dir_size(settings.THUMBNAIL_DIR)
+    recent_documents = _recent_adapter.validate_python(recent_docs, from_attributes=True)
 
     return DashboardStats(
         total_documents=total_documents,
@@ -1,27 +1,20 @@
 from __future__ import annotations
 
-import re
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models import DocumentType
 from app.schemas import DocumentTypeCreate, DocumentTypeResponse, DocumentTypeUpdate
+from app.utils.slug import slugify
 
 router = APIRouter(prefix="/document-types", tags=["document-types"])
 
 
-def _slugify(name: str) -> str:
-    slug = name.lower().strip()
-    slug = re.sub(r"[^\w\s-]", "", slug)
-    slug = re.sub(r"[\s_]+", "-", slug)
-    slug = re.sub(r"-+", "-", slug).strip("-")
-    return slug
-
-
 @router.get("/", response_model=List[DocumentTypeResponse])
 async def list_document_types(db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(DocumentType).order_by(DocumentType.name))
@@ -30,15 +23,17 @@ async def list_document_types(db: AsyncSession = Depends(get_db)):
 
 @router.post("/", response_model=DocumentTypeResponse, status_code=status.HTTP_201_CREATED)
 async def create_document_type(data: DocumentTypeCreate, db: AsyncSession = Depends(get_db)):
-    slug = _slugify(data.name)
-    existing = await db.execute(select(DocumentType).where(DocumentType.slug == slug))
-    if existing.scalar_one_or_none():
+    slug = slugify(data.name)
+    # Single atomic round-trip; a concurrent insert of the same slug yields no row
+    stmt = (
+        pg_insert(DocumentType)
+        .values(name=data.name, slug=slug)
+        .on_conflict_do_nothing(index_elements=["slug"])
+        .returning(DocumentType)
+    )
+    dt = await db.scalar(stmt)
+    if dt is None:
         raise HTTPException(status_code=409, detail=f"Document type '{data.name}' already exists")
-
-    dt = DocumentType(name=data.name, slug=slug)
-    db.add(dt)
-    await db.flush()
-    await db.refresh(dt)
     return dt
 
 
@@ -1,21 +1,25 @@
 from __future__ import annotations
 
-import math
 import os
 import shutil
 import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from stat import S_ISREG
+from typing import BinaryIO, List, Optional
 
+from celery import group
 from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
-from sqlalchemy import func, select, or_, and_
+from pydantic import TypeAdapter
+from sqlalchemy import func, insert, select, or_, and_, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, selectinload
 
+from app.celery_app import celery_app
 from app.config import get_settings
-from app.database import get_db
+from app.database import get_db, set_hnsw_ef_search
 from app.models import (
     Correspondent,
     CustomField,
@@ -34,17 +38,91 @@ from app.schemas import (
     SearchRequest,
     SearchResponse,
     SearchResultItem,
-    TagResponse,
 )
+from app.services.embeddings import get_embedding_service
+from app.tasks.dashboard import schedule_month_counts_refresh
+from app.utils.mime import get_magic
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 settings = get_settings()
 
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+MEDIA_ROOT = Path(settings.MEDIA_DIR)
+THUMB_ROOT = Path(settings.THUMBNAIL_DIR)
+
+
+# Eager-load exactly what each schema serializes; every relationship is
+# lazy="raise", so anything left out fails instead of issuing a query.
+# Many-to-one rows ride along in the same SELECT, collections get one IN query.
+_LIST_LOAD_OPTIONS = (
+    selectinload(Document.tags),
+    joinedload(Document.document_type),
+    joinedload(Document.correspondent),
+)
+_DETAIL_LOAD_OPTIONS = _LIST_LOAD_OPTIONS + (
+    selectinload(Document.custom_fields),
+    selectinload(Document.processing_logs),
+)
+_SEARCH_LOAD_OPTIONS = (
+    selectinload(Document.tags),
+)
+
+# Built once at import; each response validates its whole page in one call
+_list_adapter = TypeAdapter(List[DocumentListResponse])
+_search_adapter = TypeAdapter(List[SearchResultItem])
+
 
 def _get_extension(filename: str) -> str:
     return filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
 
 
+def _save_upload(src: BinaryIO, dest: Path, head: bytes, limit: int) -> Optional[int]:
+    """Write ``head`` and the rest of ``src`` to ``dest``.
+
+    Returns the total size, or ``None`` (with ``dest`` removed) once ``limit`` is exceeded.
+    """
+    size = len(head)
+    with open(dest, "wb") as f:
+        f.write(head)
+        while size <= limit:
+            chunk = src.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                return size
+            size += len(chunk)
+            f.write(chunk)
+    os.unlink(dest)
+    return None
+
+
+def _search_hit(doc: Document, score: float) -> dict:
+    return {
+        "id": doc.id,
+        "title": doc.title,
+        "original_filename": doc.original_filename,
+        "snippet": (doc.content or "")[:200],
+        "score": score,
+        "tags": doc.tags,
+    }
+
+
+def _stat_file(path: Path) -> Optional[os.stat_result]:
+    """Stat ``path`` once for FileResponse; ``None`` unless it is a regular file."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st if S_ISREG(st.st_mode) else None
+
+
+def _remove_files(paths: List[Path]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
 @router.post("/upload", response_model=List[DocumentListResponse], status_code=status.HTTP_201_CREATED)
 async def upload_documents(
     files: List[UploadFile] = File(...),
@@ -52,6 +130,11 @@ async def upload_documents(
 ):
     results: list[Document] = []
 
+    # Every file in the batch lands in the same month directory
+    year_month = datetime.utcnow().strftime("%Y/%m")
+    target_dir = MEDIA_ROOT / year_month
+    await run_in_threadpool(os.makedirs, target_dir, exist_ok=True)
+
     for upload in files:
         if not upload.filename:
             raise HTTPException(status_code=400, detail="Filename is required")
@@ -60,37 +143,43 @@ async def upload_documents(
         if ext not in settings.ALLOWED_EXTENSIONS:
             raise HTTPException(
                 status_code=400,
-                detail=f"Extension '.{ext}' not allowed. Allowed: {settings.ALLOWED_EXTENSIONS}",
+                detail=f"Extension '.{ext}' not allowed. Allowed: {', '.join(sorted(settings.ALLOWED_EXTENSIONS))}",
             )
 
-        content_bytes = await upload.read()
-        if len(content_bytes) > settings.MAX_UPLOAD_SIZE_BYTES:
+        # Only the head is kept in memory (for mime sniffing); the rest is
+        # copied to disk in chunks while the size limit is enforced.
+        head = await upload.read(2048)
+
+        # The document id doubles as the unique file name prefix
+        doc_id = uuid.uuid4()
+        unique_name = f"{doc_id.hex}_{upload.filename}"
+        relative_path = f"{year_month}/{unique_name}"
+        abs_path = target_dir / unique_name
+
+        file_size = await run_in_threadpool(
+            _save_upload, upload.file, abs_path, head, settings.MAX_UPLOAD_SIZE_BYTES
+        )
+        if file_size is None:
             raise HTTPException(
                 status_code=400,
                 detail=f"File '{upload.filename}' exceeds {settings.MAX_UPLOAD_SIZE_MB}MB limit",
             )
 
-        now = datetime.utcnow()
-        year_month = now.strftime("%Y/%m")
-        unique_name = f"{uuid.uuid4().hex}_{upload.filename}"
-        relative_path = os.path.join(year_month, unique_name)
-        abs_path = os.path.join(settings.MEDIA_DIR, relative_path)
-
-        os.makedirs(os.path.dirname(abs_path), exist_ok=True)
-        with open(abs_path, "wb") as f:
-            f.write(content_bytes)
-
-        import magic
-        mime = magic.from_buffer(content_bytes[:2048], mime=True)
+        detector = get_magic()
+        mime = detector.from_buffer(head) if detector else "application/octet-stream"
 
         doc = Document(
-            id=uuid.uuid4(),
+            id=doc_id,
             title=None,
             original_filename=upload.filename,
             file_path=relative_path,
-            file_size=len(content_bytes),
+            file_size=file_size,
             mime_type=mime,
             status=DocumentStatus.pending,
+            # Known to be empty; set so the response never tries to load them
+            document_type=None,
+            correspondent=None,
+            tags=[],
         )
         db.add(doc)
         await db.flush()
@@ -98,10 +187,11 @@ async def upload_documents(
 
     await db.commit()
 
-    # Trigger Celery tasks
-    from app.celery_app import celery_app
-    for doc in results:
-        celery_app.send_task("app.tasks.process.process_document", args=[str(doc.id)])
+    # Trigger Celery tasks; a group publishes every message over one producer
+    group(
+        celery_app.signature("app.tasks.process.process_document", args=[str(doc.id)])
+        for doc in results
+    ).apply_async()
 
     return results
 
@@ -120,7 +210,7 @@ async def list_documents(
     sort_order: str = Query("desc", pattern=r"^(asc|desc)$"),
     db: AsyncSession = Depends(get_db),
 ):
-    query = select(Document)
+    query = select(Document).options(*_LIST_LOAD_OPTIONS)
     count_query = select(func.count(Document.id))
 
     filters = []
@@ -143,27 +233,33 @@ async def list_documents(
         query = query.where(and_(*filters))
         count_query = count_query.where(and_(*filters))
 
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
-
     sort_col = getattr(Document, sort_by, Document.added_date)
     if sort_order == "desc":
         query = query.order_by(sort_col.desc())
     else:
         query = query.order_by(sort_col.asc())
 
+    # The window count rides along with the page, so the filters run once
     offset = (page - 1) * size
-    query = query.offset(offset).limit(size)
+    query = query.add_columns(func.count().over().label("total")).offset(offset).limit(size)
 
     result = await db.execute(query)
-    docs = result.scalars().all()
+    rows = result.all()
+    docs = [row[0] for row in rows]
+    if rows:
+        total = rows[0].total
+    elif page > 1:
+        # Past the last page there is no row to carry the total
+        total = (await db.execute(count_query)).scalar() or 0
+    else:
+        total = 0
 
     return DocumentPaginatedResponse(
-        items=[DocumentListResponse.model_validate(d) for d in docs],
+        items=_list_adapter.validate_python(docs, from_attributes=True),
         total=total,
         page=page,
         size=size,
-        pages=math.ceil(total / size) if size else 0,
+        pages=(total + size - 1) // size if size else 0,
     )
 
 
@@ -172,8 +268,7 @@ async def get_document(
     doc_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(select(Document).where(Document.id == doc_id))
-    doc = result.scalar_one_or_none()
+    doc = await db.get(Document, doc_id, options=_DETAIL_LOAD_OPTIONS)
     if doc is None:
         raise HTTPException(status_code=404, detail="Document not found")
     return DocumentResponse.model_validate(doc)
@@ -185,8 +280,7 @@ async def update_document(
     data: DocumentUpdate,
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(select(Document).where(Document.id == doc_id))
-    doc = result.scalar_one_or_none()
+    doc = await db.get(Document, doc_id)
     if doc is None:
         raise HTTPException(status_code=404, detail="Document not found")
 
@@ -199,35 +293,48 @@ async def update_document(
     if data.created_date is not None:
         doc.created_date = data.created_date
 
+    # Replace associations with one DELETE and one executemany INSERT each
     if data.tag_ids is not None:
         # Remove existing tags
         await db.execute(
             DocumentTag.__table__.delete().where(DocumentTag.document_id == doc_id)
         )
-        for tid in data.tag_ids:
-            db.add(DocumentTag(document_id=doc_id, tag_id=tid))
+        if data.tag_ids:
+            await db.execute(
+                insert(DocumentTag.__table__),
+                [{"document_id": doc_id, "tag_id": tid} for tid in dict.fromkeys(data.tag_ids)],
+            )
 
     if data.custom_fields is not None:
         # Remove existing custom fields
-        existing = await db.execute(
-            select(CustomField).where(CustomField.document_id == doc_id)
+        await db.execute(
+            CustomField.__table__.delete().where(CustomField.document_id == doc_id)
         )
-        for cf in existing.scalars().all():
-            await db.delete(cf)
-        for cf_data in data.custom_fields:
-            db.add(CustomField(
-                document_id=doc_id,
-                field_name=cf_data.field_name,
-                field_value=cf_data.field_value,
-                field_type=cf_data.field_type,
-            ))
+        if data.custom_fields:
+            await db.execute(
+                insert(CustomField.__table__),
+                [
+                    {
+                        "document_id": doc_id,
+                        "field_name": cf_data.field_name,
+                        "field_value": cf_data.field_value,
+                        "field_type": cf_data.field_type,
+                    }
+                    for cf_data in data.custom_fields
+                ],
+            )
 
     doc.modified_date = datetime.utcnow()
     await db.flush()
 
-    # Re-fetch to get relationships
-    result = await db.execute(select(Document).where(Document.id == doc_id))
-    doc = result.scalar_one()
+    # Re-select with the detail loaders; populate_existing overwrites the
+    # identity-map copy so the rewritten tags and fields are picked up
+    doc = await db.scalar(
+        select(Document)
+        .where(Document.id == doc_id)
+        .options(*_DETAIL_LOAD_OPTIONS)
+        .execution_options(populate_existing=True)
+    )
     return DocumentResponse.model_validate(doc)
 
 
@@ -236,22 +343,20 @@ async def delete_document(
     doc_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(select(Document).where(Document.id == doc_id))
-    doc = result.scalar_one_or_none()
+    doc = await db.get(Document, doc_id)
     if doc is None:
         raise HTTPException(status_code=404, detail="Document not found")
 
     # Remove files from disk
-    abs_path = os.path.join(settings.MEDIA_DIR, doc.file_path)
-    if os.path.exists(abs_path):
-        os.remove(abs_path)
+    paths = [MEDIA_ROOT / doc.file_path]
     if doc.thumbnail_path:
-        thumb_abs = os.path.join(settings.THUMBNAIL_DIR, doc.thumbnail_path)
-        if os.path.exists(thumb_abs):
-            os.remove(thumb_abs)
+        paths.append(THUMB_ROOT / doc.thumbnail_path)
+    await run_in_threadpool(_remove_files, paths)
 
     await db.delete(doc)
-    await db.flush()
+    await db.commit()
+
+    await run_in_threadpool(schedule_month_counts_refresh)
 
 
 @router.get("/{doc_id}/download")
@@ -259,19 +364,20 @@ async def download_document(
     doc_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(select(Document).where(Document.id == doc_id))
-    doc = result.scalar_one_or_none()
+    doc = await db.get(Document, doc_id)
     if doc is None:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    abs_path = os.path.join(settings.MEDIA_DIR, doc.file_path)
-    if not os.path.exists(abs_path):
+    abs_path = MEDIA_ROOT / doc.file_path
+    st = await run_in_threadpool(_stat_file, abs_path)
+    if st is None:
         raise HTTPException(status_code=404, detail="File not found on disk")
 
     return FileResponse(
         path=abs_path,
         filename=doc.original_filename,
         media_type=doc.mime_type or "application/octet-stream",
+        stat_result=st,
     )
 
 
@@ -280,18 +386,18 @@ async def get_thumbnail(
     doc_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(select(Document).where(Document.id == doc_id))
-    doc = result.scalar_one_or_none()
+    doc = await db.get(Document, doc_id)
     if doc is None:
         raise HTTPException(status_code=404, detail="Document not found")
     if not doc.thumbnail_path:
         raise HTTPException(status_code=404, detail="Thumbnail not available")
 
-    abs_path = os.path.join(settings.THUMBNAIL_DIR, doc.thumbnail_path)
-    if not os.path.exists(abs_path):
+    abs_path = THUMB_ROOT / doc.thumbnail_path
+    st = await run_in_threadpool(_stat_file, abs_path)
+    if st is None:
         raise HTTPException(status_code=404, detail="Thumbnail file not found")
 
-    return FileResponse(path=abs_path, media_type="image/png")
+    return FileResponse(path=abs_path, media_type="image/png", stat_result=st)
 
 
 @router.post("/{doc_id}/reprocess", status_code=status.HTTP_202_ACCEPTED)
@@ -299,15 +405,13 @@ async def reprocess_document(
     doc_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(select(Document).where(Document.id == doc_id))
-    doc = result.scalar_one_or_none()
+    doc = await db.get(Document, doc_id)
     if doc is None:
         raise HTTPException(status_code=404, detail="Document not found")
 
     doc.status = DocumentStatus.pending
     await db.flush()
 
-    from app.celery_app import celery_app
     celery_app.send_task("app.tasks.process.reprocess_document", args=[str(doc_id)])
 
     return {"detail": "Reprocessing started", "document_id": str(doc_id)}
@@ -319,62 +423,40 @@ async def search_documents(
     db: AsyncSession = Depends(get_db),
 ):
     offset = (body.page - 1) * body.size
-    items: list[SearchResultItem] = []
+    hits: list[dict] = []
 
     if body.mode == "fulltext":
         ts_query = func.plainto_tsquery("english", body.query)
+        matches = Document.content_tsv.op("@@")(ts_query)
+        # ORDER BY the output label so ts_rank is evaluated once per row
+        rank = func.ts_rank(Document.content_tsv, ts_query).label("rank")
         stmt = (
-            select(
-                Document,
-                func.ts_rank(
-                    func.to_tsvector("english", func.coalesce(Document.content, "")),
-                    ts_query,
-                ).label("rank"),
-            )
-            .where(
-                func.to_tsvector("english", func.coalesce(Document.content, "")).op("@@")(ts_query)
-            )
-            .order_by(func.ts_rank(
-                func.to_tsvector("english", func.coalesce(Document.content, "")),
-                ts_query,
-            ).desc())
+            select(Document, rank)
+            .where(matches)
+            .options(*_SEARCH_LOAD_OPTIONS)
+            .order_by(rank.desc())
             .offset(offset)
             .limit(body.size)
         )
         result = await db.execute(stmt)
         rows = result.all()
 
-        count_stmt = (
-            select(func.count(Document.id))
-            .where(
-                func.to_tsvector("english", func.coalesce(Document.content, "")).op("@@")(ts_query)
-            )
-        )
+        count_stmt = select(func.count(Document.id)).where(matches)
         total = (await db.execute(count_stmt)).scalar() or 0
 
-        for doc, rank in rows:
-            snippet = (doc.content or "")[:200]
-            items.append(SearchResultItem(
-                id=doc.id,
-                title=doc.title,
-                original_filename=doc.original_filename,
-                snippet=snippet,
-                score=float(rank),
-                tags=[TagResponse.model_validate(t) for t in doc.tags],
-            ))
+        hits = [_search_hit(doc, float(rank)) for doc, rank in rows]
 
     elif body.mode == "semantic":
-        from app.services.embeddings import EmbeddingService
-        emb_service = EmbeddingService()
-        query_embedding = emb_service.embed_text(body.query)
+        query_embedding = get_embedding_service().embed_query(body.query)
+        await set_hnsw_ef_search(db)
 
+        # ORDER BY the bare <=> expression so the planner matches the HNSW index
+        distance = Document.embedding.cosine_distance(query_embedding)
         stmt = (
-            select(
-                Document,
-                Document.embedding.cosine_distance(query_embedding).label("distance"),
-            )
+            select(Document, distance.label("distance"))
             .where(Document.embedding.isnot(None))
-            .order_by("distance")
+            .options(*_SEARCH_LOAD_OPTIONS)
+            .order_by(distance)
             .offset(offset)
             .limit(body.size)
         )
@@ -384,82 +466,51 @@ async def search_documents(
         count_stmt = select(func.count(Document.id)).where(Document.embedding.isnot(None))
         total = (await db.execute(count_stmt)).scalar() or 0
 
-        for doc, distance in rows:
-            snippet = (doc.content or "")[:200]
-            items.append(SearchResultItem(
-                id=doc.id,
-                title=doc.title,
-                original_filename=doc.original_filename,
-                snippet=snippet,
-                score=float(1 - distance) if distance is not None else 0.0,
-                tags=[TagResponse.model_validate(t) for t in doc.tags],
-            ))
+        hits = [
+            _search_hit(doc, float(1 - distance) if distance is not None else 0.0)
+            for doc, distance in rows
+        ]
 
     else:  # hybrid
-        from app.services.embeddings import EmbeddingService
-        emb_service = EmbeddingService()
-        query_embedding = emb_service.embed_text(body.query)
+        query_embedding = get_embedding_service().embed_query(body.query)
         ts_query = func.plainto_tsquery("english", body.query)
 
-        # Full-text search results
-        ft_stmt = (
-            select(
-                Document.id,
-                func.ts_rank(
-                    func.to_tsvector("english", func.coalesce(Document.content, "")),
-                    ts_query,
-                ).label("ft_rank"),
-            )
-            .where(
-                func.to_tsvector("english", func.coalesce(Document.content, "")).op("@@")(ts_query)
-            )
-        )
-        ft_result = await db.execute(ft_stmt)
-        ft_scores = {row[0]: float(row[1]) for row in ft_result.all()}
+        matches = Document.content_tsv.op("@@")(ts_query)
+        has_embedding = Document.embedding.isnot(None)
 
-        # Semantic search results
-        sem_stmt = (
+        # Blend and paginate in SQL: each branch contributes its weighted
+        # score, documents found by both get the sum, only one page comes back.
+        scores = union_all(
             select(
-                Document.id,
-                Document.embedding.cosine_distance(query_embedding).label("distance"),
-            )
-            .where(Document.embedding.isnot(None))
+                Document.id.label("id"),
+                (func.ts_rank(Document.content_tsv, ts_query) * 0.4).label("score"),
+            ).where(matches),
+            select(
+                Document.id.label("id"),
+                ((1 - Document.embedding.cosine_distance(query_embedding)) * 0.6).label("score"),
+            ).where(has_embedding),
+        ).subquery("scores")
+        score = func.sum(scores.c.score).label("score")
+        page_stmt = (
+            select(scores.c.id, score)
+            .group_by(scores.c.id)
+            .order_by(score.desc(), scores.c.id)
+            .offset(offset)
+            .limit(body.size)
         )
-        sem_result = await db.execute(sem_stmt)
-        sem_scores = {row[0]: float(1 - row[1]) if row[1] is not None else 0.0 for row in sem_result.all()}
-
-        # Combine scores
-        all_ids = set(ft_scores.keys()) | set(sem_scores.keys())
-        combined: list[tuple[uuid.UUID, float]] = []
-        for did in all_ids:
-            ft = ft_scores.get(did, 0.0)
-            sem = sem_scores.get(did, 0.0)
-            # Normalize ft_rank (usually 0-1 range) and combine
-            combined.append((did, ft * 0.4 + sem * 0.6))
-
-        combined.sort(key=lambda x: x[1], reverse=True)
-        total = len(combined)
-        page_ids = [c[0] for c in combined[offset : offset + body.size]]
-        score_map = {c[0]: c[1] for c in combined}
+        score_map = {did: float(sc) for did, sc in (await db.execute(page_stmt)).all()}
+        page_ids = list(score_map)
+
+        count_stmt = select(func.count(Document.id)).where(or_(matches, has_embedding))
+        total = (await db.execute(count_stmt)).scalar() or 0
 
         if page_ids:
-            docs_result = await db.execute(select(Document).where(Document.id.in_(page_ids)))
+            docs_result = await db.execute(select(Document).where(Document.id.in_(page_ids)).options(*_SEARCH_LOAD_OPTIONS))
             docs_map = {d.id: d for d in docs_result.scalars().all()}
-            for did in page_ids:
-                doc = docs_map.get(did)
-                if doc:
-                    snippet = (doc.content or "")[:200]
-                    items.append(SearchResultItem(
-                        id=doc.id,
-                        title=doc.title,
-                        original_filename=doc.original_filename,
-                        snippet=snippet,
-                        score=score_map.get(did, 0.0),
-                        tags=[TagResponse.model_validate(t) for t in doc.tags],
-                    ))
+            hits = [_search_hit(docs_map[did], score_map[did]) for did in page_ids if did in docs_map]
 
     return SearchResponse(
-        items=items,
+        items=_search_adapter.validate_python(hits, from_attributes=True),
         total=total,
         page=body.page,
         size=body.size,
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import re
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException, status
@@ -10,18 +9,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.models import Tag
 from app.schemas import TagCreate, TagResponse, TagUpdate
+from app.utils.slug import slugify
 
 router = APIRouter(prefix="/tags", tags=["tags"])
 
 
-def _slugify(name: str) -> str:
-    slug = name.lower().strip()
-    slug = re.sub(r"[^\w\s-]", "", slug)
-    slug = re.sub(r"[\s_]+", "-", slug)
-    slug = re.sub(r"-+", "-", slug).strip("-")
-    return slug
-
-
 @router.get("/", response_model=List[TagResponse])
 async def list_tags(db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(Tag).order_by(Tag.name))
@@ -30,7 +22,7 @@ async def list_tags(db: AsyncSession = Depends(get_db)):
 
 @router.post("/", response_model=TagResponse, status_code=status.HTTP_201_CREATED)
 async def create_tag(data: TagCreate, db: AsyncSession = Depends(get_db)):
-    slug = _slugify(data.name)
+    slug = slugify(data.name)
     existing = await db.execute(select(Tag).where(Tag.slug == slug))
     if existing.scalar_one_or_none():
         raise HTTPException(status_code=409, detail=f"Tag with slug '{slug}' already exists")
@@ -60,7 +52,7 @@ async def update_tag(tag_id: int, data: TagUpdate, db: AsyncSession = Depends(ge
 
     if data.name is not None:
         tag.name = data.name
-        tag.slug = _slugify(data.name)
+        tag.slug = slugify(data.name)
     if data.color is not None:
         tag.color = data.color
 
@@ -1,26 +1,73 @@
 from __future__ import annotations
 
+import asyncio
+import uuid
 from typing import AsyncGenerator
 
+from fastapi import HTTPException
+from sqlalchemy import event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy.pool import NullPool
 from pgvector.sqlalchemy import Vector  # noqa: F401 — re-exported for convenience
 
 from app.config import get_settings
 
 settings = get_settings()
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=False,
-    pool_size=20,
-    max_overflow=10,
-    pool_pre_ping=True,
-)
+POOL_SIZE = 20
+
+if settings.POOLING_MODE == "pgbouncer":
+    # PgBouncer already pools, and in transaction mode consecutive statements
+    # may land on different server connections, so asyncpg must not cache or
+    # reuse named prepared statements.
+    engine = create_async_engine(
+        settings.DATABASE_URL,
+        echo=False,
+        poolclass=NullPool,
+        connect_args={
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        },
+    )
+else:
+    engine = create_async_engine(
+        settings.DATABASE_URL,
+        echo=False,
+        pool_size=POOL_SIZE,
+        max_overflow=10,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+
+class _WriteTrackingSession(Session):
+    """Sync session that records whether its transaction wrote anything."""
+
+
+@event.listens_for(_WriteTrackingSession, "after_flush")
+def _mark_flush(session: Session, flush_context) -> None:
+    session.info["has_writes"] = True
+
+
+@event.listens_for(_WriteTrackingSession, "do_orm_execute")
+def _mark_dml(orm_execute_state) -> None:
+    # Core insert()/update()/delete() run through session.execute bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["has_writes"] = True
+
+
+@event.listens_for(_WriteTrackingSession, "after_commit")
+def _clear_writes(session: Session) -> None:
+    session.info.pop("has_writes", None)
+
 
 async_session_factory = async_sessionmaker(
     engine,
     class_=AsyncSession,
+    sync_session_class=_WriteTrackingSession,
     expire_on_commit=False,
 )
 
@@ -33,9 +80,42 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_factory() as session:
         try:
             yield session
-            await session.commit()
+            # Read-only requests skip the COMMIT round-trip; closing the
+            # session rolls their transaction back instead.
+            if session.info.get("has_writes") or session.new or session.dirty or session.deleted:
+                await session.commit()
+        except PoolTimeoutError:
+            # Every pooled connection is busy; shed load instead of queueing
+            await session.rollback()
+            raise HTTPException(
+                status_code=503,
+                detail="Database is busy, please retry",
+                headers={"Retry-After": "1"},
+            ) from None
         except Exception:
             await session.rollback()
             raise
         finally:
             await session.close()
+
+
+async def set_hnsw_ef_search(session: AsyncSession) -> None:
+    """Apply the configured ``hnsw.ef_search`` to the session's current transaction."""
+    # SET cannot take bind parameters; set_config(..., is_local => true) is the
+    # parameterised equivalent of SET LOCAL.
+    await session.execute(
+        text("SELECT set_config('hnsw.ef_search', :value, true)"),
+        {"value": str(settings.HNSW_EF_SEARCH)},
+    )
+
+
+async def warm_pool(count: int) -> None:
+    """Open ``count`` pooled connections concurrently and return them to the pool."""
+    if settings.POOLING_MODE == "pgbouncer":
+        return
+
+    async def _checkout() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(_checkout() for _ in range(min(count, POOL_SIZE))))
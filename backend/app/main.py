@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import logging
 import os
+import shutil
 
 from contextlib import asynccontextmanager
 
@@ -22,6 +23,9 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("DocuAI backend starting up...")
 
+    # Larger copy chunks for backups and moved uploads (default is 64 KiB on Linux)
+    shutil.COPY_BUFSIZE = 1 << 20
+
     # Ensure directories exist
     for d in [settings.MEDIA_DIR, settings.CONSUME_DIR, settings.THUMBNAIL_DIR]:
         os.makedirs(d, exist_ok=True)
@@ -41,12 +45,37 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning("Could not run alembic migrations (DB may not be ready): %s", e)
 
+    try:
+        from fastapi.concurrency import run_in_threadpool
+        from app.services.embeddings import get_embedding_service
+        await run_in_threadpool(get_embedding_service().preload)
+    except Exception as e:
+        logger.warning("Could not preload the embedding model: %s", e)
+
+    try:
+        from app.database import warm_pool
+        await warm_pool(settings.POOL_WARMUP)
+    except Exception as e:
+        logger.warning("Could not warm the database pool: %s", e)
+
+    if settings.USEARCH_ENABLED:
+        try:
+            from app.database import async_session_factory
+            from app.services.vector_index import get_vector_index
+            async with async_session_factory() as session:
+                await get_vector_index().sync(session)
+        except Exception as e:
+            logger.warning("Could not build the USearch index (will retry on first query): %s", e)
+
     yield
 
     # Shutdown
     logger.info("DocuAI backend shutting down...")
     from app.database import engine
     await engine.dispose()
+    from app.services.ollama import get_ollama_async_client
+    if get_ollama_async_client.cache_info().currsize:
+        await get_ollama_async_client().aclose()
 
 
 app = FastAPI(
@@ -6,6 +6,7 @@ from datetime import datetime
 
 from sqlalchemy import (
     Column,
+    Computed,
     DateTime,
     Enum,
     ForeignKey,
@@ -15,10 +16,11 @@ from sqlalchemy import (
     Text,
     BigInteger,
     func,
+    text,
 )
-from sqlalchemy.dialects.postgresql import JSON, UUID
-from sqlalchemy.orm import relationship
-from pgvector.sqlalchemy import Vector
+from sqlalchemy.dialects.postgresql import JSON, TSVECTOR, UUID
+from sqlalchemy.orm import deferred, relationship
+from pgvector.sqlalchemy import HALFVEC
 
 from app.database import Base
 
@@ -36,6 +38,10 @@ class Document(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title = Column(String(512), nullable=True, index=True)
     content = Column(Text, nullable=True)
+    content_tsv = deferred(Column(
+        TSVECTOR,
+        Computed("to_tsvector('english', COALESCE(content, ''))", persisted=True),
+    ))
     original_filename = Column(String(512), nullable=False)
     file_path = Column(String(1024), nullable=False)
     thumbnail_path = Column(String(1024), nullable=True)
@@ -44,23 +50,52 @@ class Document(Base):
     created_date = Column(DateTime(timezone=True), nullable=True)
     added_date = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     modified_date = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
-    status = Column(Enum(DocumentStatus), default=DocumentStatus.pending, nullable=False, index=True)
-    embedding = Column(Vector(384), nullable=True)
+    status = Column(Enum(DocumentStatus), default=DocumentStatus.pending, nullable=False)
+    # FP16 storage halves the bytes read per HNSW hop; recall loss on
+    # normalized MiniLM vectors is negligible
+    embedding = Column(HALFVEC(384), nullable=True)
     page_count = Column(Integer, nullable=True)
     file_size = Column(BigInteger, nullable=True)
     mime_type = Column(String(128), nullable=True)
+    # Not mapped: index_xid (xid8, migration 014) is stamped by a trigger on
+    # every UPDATE and read only by the USearch sync in vector_index.py
 
     # Relationships
-    document_type = relationship("DocumentType", back_populates="documents", lazy="selectin")
-    correspondent = relationship("Correspondent", back_populates="documents", lazy="selectin")
-    tags = relationship("Tag", secondary="document_tags", back_populates="documents", lazy="selectin")
-    custom_fields = relationship("CustomField", back_populates="document", cascade="all, delete-orphan", lazy="selectin")
-    processing_logs = relationship("ProcessingLog", back_populates="document", cascade="all, delete-orphan", lazy="selectin")
+    # Nothing loads implicitly: queries ask for the relationships they
+    # serialize, and a forgotten one fails loudly instead of costing a query.
+    # The foreign keys cascade, so deletes never need the collections loaded.
+    document_type = relationship("DocumentType", back_populates="documents", lazy="raise")
+    correspondent = relationship("Correspondent", back_populates="documents", lazy="raise")
+    tags = relationship("Tag", secondary="document_tags", back_populates="documents", lazy="raise", passive_deletes=True)
+    custom_fields = relationship("CustomField", back_populates="document", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
+    processing_logs = relationship("ProcessingLog", back_populates="document", cascade="all, delete-orphan", lazy="raise", passive_deletes=True)
 
     __table_args__ = (
         Index("ix_documents_added_date", "added_date"),
         Index("ix_documents_created_date", "created_date"),
-        Index("ix_documents_content_fts", func.to_tsvector("english", func.coalesce(content, "")), postgresql_using="gin"),
+        Index(
+            "ix_documents_status_added_date",
+            "status",
+            text("added_date DESC"),
+            postgresql_include=["document_type_id", "correspondent_id"],
+        ),
+        Index("ix_documents_content_tsv", "content_tsv", postgresql_using="gin", postgresql_with={"fastupdate": "off"}),
+        # ANN indexes built by migrations 002/007/008
+        Index(
+            "ix_documents_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 24, "ef_construction": 128},
+            postgresql_ops={"embedding": "halfvec_cosine_ops"},
+        ),
+        Index(
+            "ix_documents_embedding_hnsw_done",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 24, "ef_construction": 128},
+            postgresql_ops={"embedding": "halfvec_cosine_ops"},
+            postgresql_where=text("status = 'done'"),
+        ),
     )
 
 
@@ -70,9 +105,14 @@ class Tag(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(128), nullable=False)
     color = Column(String(7), default="#3b82f6", nullable=False)
-    slug = Column(String(128), unique=True, nullable=False, index=True)
+    slug = Column(String(128), nullable=False)
 
-    documents = relationship("Document", secondary="document_tags", back_populates="tags", lazy="selectin")
+    documents = relationship("Document", secondary="document_tags", back_populates="tags", lazy="raise", passive_deletes=True)
+
+    __table_args__ = (
+        # Unique and covering: slug lookups never touch the heap (migration 013)
+        Index("ix_tags_slug", "slug", unique=True, postgresql_include=["id", "name", "color"]),
+    )
 
 
 class DocumentTag(Base):
@@ -81,15 +121,23 @@ class DocumentTag(Base):
     document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
     tag_id = Column(Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
 
+    __table_args__ = (
+        Index("ix_document_tags_tag_id", "tag_id", "document_id"),
+    )
+
 
 class Correspondent(Base):
     __tablename__ = "correspondents"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(256), nullable=False)
-    slug = Column(String(256), unique=True, nullable=False, index=True)
+    slug = Column(String(256), nullable=False)
 
-    documents = relationship("Document", back_populates="correspondent", lazy="selectin")
+    documents = relationship("Document", back_populates="correspondent", lazy="raise", passive_deletes=True)
+
+    __table_args__ = (
+        Index("ix_correspondents_slug", "slug", unique=True, postgresql_include=["id", "name"]),
+    )
 
 
 class DocumentType(Base):
@@ -97,9 +145,13 @@ class DocumentType(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(256), nullable=False)
-    slug = Column(String(256), unique=True, nullable=False, index=True)
+    slug = Column(String(256), nullable=False)
+
+    documents = relationship("Document", back_populates="document_type", lazy="raise", passive_deletes=True)
 
-    documents = relationship("Document", back_populates="document_type", lazy="selectin")
+    __table_args__ = (
+        Index("ix_document_types_slug", "slug", unique=True, postgresql_include=["id", "name"]),
+    )
 
 
 class CustomField(Base):
@@ -111,7 +163,7 @@ class CustomField(Base):
     field_value = Column(Text, nullable=True)
     field_type = Column(String(64), default="string", nullable=False)
 
-    document = relationship("Document", back_populates="custom_fields")
+    document = relationship("Document", back_populates="custom_fields", lazy="raise")
 
 
 class ChatHistory(Base):
@@ -123,6 +175,10 @@ class ChatHistory(Base):
     sources = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
+    __table_args__ = (
+        Index("ix_chat_history_created_at", created_at.desc()),
+    )
+
 
 class ProcessingLog(Base):
     __tablename__ = "processing_logs"
@@ -134,4 +190,4 @@ class ProcessingLog(Base):
     message = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
-    document = relationship("Document", back_populates="processing_logs")
+    document = relationship("Document", back_populates="processing_logs", lazy="raise")
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import logging
+from functools import lru_cache
+from typing import Optional
+
+import redis
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+@lru_cache(maxsize=1)
+def get_redis() -> redis.Redis:
+    """Process-wide Redis client, created lazily so forked workers get their own."""
+    return redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2.0)
+
+
+def cache_get(key: str) -> Optional[bytes]:
+    """Return the cached bytes for ``key``; a cache outage counts as a miss."""
+    if settings.CONTENT_CACHE_TTL <= 0:
+        return None
+    try:
+        return get_redis().get(key)
+    except redis.RedisError as e:
+        logger.warning("Cache read failed for %s: %s", key, e)
+        return None
+
+
+def cache_set(key: str, value: bytes) -> None:
+    """Store ``value`` under ``key`` for CONTENT_CACHE_TTL seconds, best effort."""
+    if settings.CONTENT_CACHE_TTL <= 0:
+        return
+    try:
+        get_redis().setex(key, settings.CONTENT_CACHE_TTL, value)
+    except redis.RedisError as e:
+        logger.warning("Cache write failed for %s: %s", key, e)
@@ -1,14 +1,14 @@
 from __future__ import annotations
 
-import json
 import logging
-import re
 from dataclasses import dataclass, field
 from typing import List, Optional
 
 import httpx
 
 from app.config import get_settings
+from app.services.ollama import get_ollama_client, truncate_for_prompt
+from app.utils.llm_json import parse_json_object
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -37,32 +37,31 @@ class ClassifierService:
         if not text or not text.strip():
             return ClassificationResult()
 
-        # Truncate text to avoid exceeding model context
-        truncated = text[:4000]
+        # Keep the document within the prompt's token budget
+        truncated = truncate_for_prompt(text)
 
         prompt = self._build_prompt(truncated, existing_tags, existing_types, existing_correspondents)
 
         try:
-            response = httpx.post(
-                f"{settings.OLLAMA_URL}/api/generate",
+            response = get_ollama_client().post(
+                "/api/generate",
                 json={
                     "model": settings.OLLAMA_MODEL,
                     "prompt": prompt,
                     "stream": False,
                     "format": "json",
                 },
-                timeout=120.0,
             )
             response.raise_for_status()
             data = response.json()
             raw_response = data.get("response", "")
-            return self._parse_response(raw_response)
+            return parse_classification(raw_response)
         except httpx.ConnectError:
             logger.warning("Ollama not available for classification")
-            return ClassificationResult(title=self._fallback_title(text))
+            return ClassificationResult(title=fallback_title(text))
         except Exception as e:
             logger.exception("Classification error: %s", e)
-            return ClassificationResult(title=self._fallback_title(text))
+            return ClassificationResult(title=fallback_title(text))
 
     def _build_prompt(
         self,
@@ -96,36 +95,28 @@ Document text:
 
 JSON response:"""
 
-    def _parse_response(self, raw: str) -> ClassificationResult:
-        # Try to extract JSON from the response
-        try:
-            data = json.loads(raw)
-        except json.JSONDecodeError:
-            # Try to find JSON in the response
-            json_match = re.search(r"\{.*\}", raw, re.DOTALL)
-            if json_match:
-                try:
-                    data = json.loads(json_match.group())
-                except json.JSONDecodeError:
-                    logger.warning("Could not parse classification response: %s", raw[:200])
-                    return ClassificationResult()
-            else:
-                logger.warning("No JSON found in classification response: %s", raw[:200])
-                return ClassificationResult()
-
-        return ClassificationResult(
-            title=str(data.get("title", "")),
-            tags=[str(t) for t in data.get("tags", []) if t],
-            document_type=str(data.get("document_type", "")),
-            correspondent=str(data.get("correspondent", "")),
-            date=data.get("date"),
-            summary=str(data.get("summary", "")),
-        )
-
-    def _fallback_title(self, text: str) -> str:
-        """Generate a basic title from the first meaningful line of text."""
-        lines = [l.strip() for l in text.split("\n") if l.strip()]
-        if lines:
-            title = lines[0][:100]
-            return title
-        return "Untitled Document"
+
+def parse_classification(raw: str) -> ClassificationResult:
+    """Read the classification keys from an LLM JSON response."""
+    data = parse_json_object(raw)
+    if data is None:
+        logger.warning("Could not parse classification response: %s", raw[:200])
+        return ClassificationResult()
+
+    return ClassificationResult(
+        title=str(data.get("title", "")),
+        tags=[str(t) for t in data.get("tags", []) if t],
+        document_type=str(data.get("document_type", "")),
+        correspondent=str(data.get("correspondent", "")),
+        date=data.get("date"),
+        summary=str(data.get("summary", "")),
+    )
+
+
+def fallback_title(text: str) -> str:
+    """Generate a basic title from the first meaningful line of text."""
+    lines = [l.strip() for l in text.split("\n") if l.strip()]
+    if lines:
+        title = lines[0][:100]
+        return title
+    return "Untitled Document"
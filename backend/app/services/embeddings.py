@@ -1,9 +1,22 @@
 from __future__ import annotations
 
+import hashlib
 import logging
-from typing import List
+import os
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+
+from app.config import get_settings
+from app.services.cache import cache_get, cache_set
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# The fast tokenizer's own thread pool competes with torch and with forked
+# Celery children; batching already keeps the model busy.
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
 
 
 class EmbeddingService:
@@ -14,43 +27,83 @@ class EmbeddingService:
     def __init__(self) -> None:
         pass
 
+    def preload(self) -> None:
+        """Load the model now so the first request does not pay for it."""
+        self._load_model()
+
     @classmethod
     def _load_model(cls):
         if cls._model is None:
             logger.info("Loading sentence-transformers model all-MiniLM-L6-v2...")
             from sentence_transformers import SentenceTransformer
-            cls._model = SentenceTransformer("all-MiniLM-L6-v2")
-            logger.info("Model loaded successfully")
+            if settings.EMBEDDING_THREADS:
+                import torch
+                torch.set_num_threads(settings.EMBEDDING_THREADS)
+            model = SentenceTransformer("all-MiniLM-L6-v2")
+            if model.device.type == "cuda":
+                # FP16 halves weight and activation traffic on the GPU
+                model.half()
+            cls._model = model
+            logger.info("Model loaded successfully on %s", model.device)
         return cls._model
 
     def embed_text(self, text: str) -> List[float]:
         """Embed a single text string into a 384-dim vector."""
+        return self.embed_text_np(text).tolist()
+
+    def embed_text_np(self, text: str) -> np.ndarray:
+        """Like :meth:`embed_text`, as a float32 array ready to bind to a vector column."""
+        if not text or not text.strip():
+            return np.zeros(384, dtype=np.float32)
+        cache_key = "emb:" + hashlib.blake2b(text.encode("utf-8"), digest_size=20).hexdigest()
+        cached = cache_get(cache_key)
+        if cached is not None:
+            return np.frombuffer(cached, dtype=np.float32)
+        embedding = self._encode(text)
+        cache_set(cache_key, embedding.tobytes())
+        return embedding
+
+    def _encode(self, text: str) -> np.ndarray:
+        """Run the model on ``text`` without the Redis cache."""
         if not text or not text.strip():
-            return [0.0] * 384
+            return np.zeros(384, dtype=np.float32)
         model = self._load_model()
-        embedding = model.encode(text, normalize_embeddings=True)
-        return embedding.tolist()
+        return np.ascontiguousarray(model.encode(text, normalize_embeddings=True), dtype=np.float32)
 
-    def embed_chunks(self, chunks: List[str]) -> List[List[float]]:
-        """Embed multiple text chunks at once."""
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a search query, reusing the vector for recently seen queries."""
+        return list(_embed_query_cached(query))
+
+    def embed_chunks(self, chunks: List[str]) -> np.ndarray:
+        """Embed multiple text chunks at once into an ``(N, 384)`` float32 array."""
         if not chunks:
-            return []
+            return np.empty((0, 384), dtype=np.float32)
         model = self._load_model()
-        embeddings = model.encode(chunks, normalize_embeddings=True, batch_size=32)
-        return [e.tolist() for e in embeddings]
+        # Stays one contiguous array; pgvector binds ndarray rows directly
+        return model.encode(
+            chunks,
+            normalize_embeddings=True,
+            batch_size=64,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
 
     @staticmethod
     def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
         """Split text into overlapping chunks by character count."""
         if not text:
             return []
-        chunks: list[str] = []
-        start = 0
-        text_len = len(text)
-        while start < text_len:
-            end = start + chunk_size
-            chunk = text[start:end]
-            if chunk.strip():
-                chunks.append(chunk.strip())
-            start += chunk_size - overlap
-        return chunks
+        starts = range(0, len(text), chunk_size - overlap)
+        return [chunk for chunk in (text[i : i + chunk_size].strip() for i in starts) if chunk]
+
+
+@lru_cache(maxsize=1)
+def get_embedding_service() -> EmbeddingService:
+    return EmbeddingService()
+
+
+@lru_cache(maxsize=1024)
+def _embed_query_cached(query: str) -> Tuple[float, ...]:
+    # Tuples so a caller cannot mutate the cached vector. No Redis lookup:
+    # this runs on the API event loop, and the LRU already memoizes queries.
+    return tuple(get_embedding_service()._encode(query).tolist())
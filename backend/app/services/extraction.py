@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import List
+
+import httpx
+
+from app.config import get_settings
+from app.services.classifier import ClassificationResult, fallback_title, parse_classification
+from app.services.fields import ExtractedField, fallback_fields, parse_fields
+from app.services.ollama import get_ollama_client, truncate_for_prompt
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+FIELD_TYPES = ["date", "amount", "invoice_number", "iban", "name", "address", "string"]
+
+# Structured-output schema (Ollama 0.5+): the model can only emit a matching object
+EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "tags": {"type": "array", "items": {"type": "string"}},
+        "document_type": {"type": "string"},
+        "correspondent": {"type": "string"},
+        "date": {"type": ["string", "null"]},
+        "summary": {"type": "string"},
+        "fields": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "value": {"type": "string"},
+                    "type": {"type": "string", "enum": FIELD_TYPES},
+                },
+                "required": ["name", "value", "type"],
+            },
+        },
+    },
+    "required": ["title", "tags", "document_type", "correspondent", "date", "summary", "fields"],
+}
+
+
+@dataclass
+class ExtractionResult:
+    classification: ClassificationResult = field(default_factory=ClassificationResult)
+    fields: List[ExtractedField] = field(default_factory=list)
+
+
+class ExtractionService:
+    """Classifies a document and extracts its fields with a single Ollama call."""
+
+    def extract_all(
+        self,
+        text: str,
+        existing_tags: List[str],
+        existing_types: List[str],
+        existing_correspondents: List[str],
+    ) -> ExtractionResult:
+        if not text or not text.strip():
+            return ExtractionResult()
+
+        # Keep the document within the prompt's token budget
+        truncated = truncate_for_prompt(text)
+
+        prompt = self._build_prompt(truncated, existing_tags, existing_types, existing_correspondents)
+
+        try:
+            response = get_ollama_client().post(
+                "/api/generate",
+                json={
+                    "model": settings.OLLAMA_MODEL,
+                    "prompt": prompt,
+                    "stream": False,
+                    "format": EXTRACTION_SCHEMA,
+                },
+            )
+            response.raise_for_status()
+            raw = response.json().get("response", "")
+            # Both parsers read their own keys from the same object
+            return ExtractionResult(
+                classification=parse_classification(raw),
+                fields=parse_fields(raw),
+            )
+        except httpx.ConnectError:
+            logger.warning("Ollama not available for extraction")
+        except Exception as e:
+            logger.exception("Extraction error: %s", e)
+        return ExtractionResult(
+            classification=ClassificationResult(title=fallback_title(text)),
+            fields=fallback_fields(text),
+        )
+
+    def _build_prompt(
+        self,
+        text: str,
+        existing_tags: List[str],
+        existing_types: List[str],
+        existing_correspondents: List[str],
+    ) -> str:
+        tags_hint = f"Existing tags: {', '.join(existing_tags)}" if existing_tags else "No existing tags."
+        types_hint = f"Existing document types: {', '.join(existing_types)}" if existing_types else "No existing types."
+        corr_hint = f"Existing correspondents: {', '.join(existing_correspondents)}" if existing_correspondents else "No existing correspondents."
+
+        return f"""Analyze the following document text, provide classification metadata and extract structured fields.
+
+{tags_hint}
+{types_hint}
+{corr_hint}
+
+Respond ONLY with a valid JSON object with these exact keys:
+- "title": A concise descriptive title for this document
+- "tags": An array of tag names (reuse existing tags when appropriate, or suggest new ones)
+- "document_type": The type of document (e.g., "Invoice", "Receipt", "Contract", "Letter", "Report"). Reuse existing types when appropriate.
+- "correspondent": The sender/author/company name. Reuse existing correspondents when appropriate.
+- "date": The document date in YYYY-MM-DD format, or null if not found
+- "summary": A brief 1-2 sentence summary
+- "fields": An array of extracted fields (dates, amounts, invoice/reference numbers, IBANs, person and company names, addresses). Each field has:
+  - "name": descriptive field name (e.g., "Invoice Date", "Total Amount", "IBAN")
+  - "value": the extracted value as a string
+  - "type": one of "date", "amount", "invoice_number", "iban", "name", "address", "string"
+
+Document text:
+---
+{text}
+---
+
+JSON response:"""
@@ -1,14 +1,21 @@
 from __future__ import annotations
 
-import json
 import logging
 import re
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Any, Dict, List
 
 import httpx
 
+try:
+    import hyperscan
+except ImportError:  # optional accelerator, x86-64 only
+    hyperscan = None
+
 from app.config import get_settings
+from app.services.ollama import get_ollama_client, truncate_for_prompt
+from app.utils.llm_json import parse_json_object
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -29,31 +36,30 @@ class FieldExtractor:
         if not text or not text.strip():
             return []
 
-        truncated = text[:4000]
+        truncated = truncate_for_prompt(text)
 
         prompt = self._build_prompt(truncated)
 
         try:
-            response = httpx.post(
-                f"{settings.OLLAMA_URL}/api/generate",
+            response = get_ollama_client().post(
+                "/api/generate",
                 json={
                     "model": settings.OLLAMA_MODEL,
                     "prompt": prompt,
                     "stream": False,
                     "format": "json",
                 },
-                timeout=120.0,
             )
             response.raise_for_status()
             data = response.json()
             raw = data.get("response", "")
-            return self._parse_response(raw)
+            return parse_fields(raw)
         except httpx.ConnectError:
             logger.warning("Ollama not available for field extraction")
-            return self._fallback_extract(text)
+            return fallback_fields(text)
         except Exception as e:
             logger.exception("Field extraction error: %s", e)
-            return self._fallback_extract(text)
+            return fallback_fields(text)
 
     def _build_prompt(self, text: str) -> str:
         return f"""Analyze the following document text and extract structured fields.
@@ -82,61 +88,91 @@ Document text:
 
 JSON response:"""
 
-    def _parse_response(self, raw: str) -> List[ExtractedField]:
-        try:
-            data = json.loads(raw)
-        except json.JSONDecodeError:
-            json_match = re.search(r"\{.*\}", raw, re.DOTALL)
-            if json_match:
-                try:
-                    data = json.loads(json_match.group())
-                except json.JSONDecodeError:
-                    logger.warning("Could not parse field extraction response")
-                    return []
-            else:
-                return []
-
-        fields_data = data.get("fields", [])
-        if not isinstance(fields_data, list):
-            return []
 
-        result: list[ExtractedField] = []
-        for f in fields_data:
-            if isinstance(f, dict) and "name" in f and "value" in f:
-                result.append(ExtractedField(
-                    name=str(f["name"]),
-                    value=str(f["value"]),
-                    type=str(f.get("type", "string")),
-                ))
-        return result
-
-    def _fallback_extract(self, text: str) -> List[ExtractedField]:
-        """Regex-based fallback when Ollama is unavailable."""
-        fields: list[ExtractedField] = []
-
-        # IBAN
-        iban_pattern = r"\b[A-Z]{2}\d{2}[\s]?[\dA-Z]{4}[\s]?[\dA-Z]{4}[\s]?[\dA-Z]{4}[\s]?[\dA-Z]{0,16}\b"
-        for match in re.finditer(iban_pattern, text):
-            fields.append(ExtractedField(name="IBAN", value=match.group().strip(), type="iban"))
-
-        # Dates (various formats)
-        date_patterns = [
-            (r"\b\d{4}-\d{2}-\d{2}\b", "Date"),
-            (r"\b\d{2}[./]\d{2}[./]\d{4}\b", "Date"),
-            (r"\b\d{2}\.\s?\w+\s?\d{4}\b", "Date"),
-        ]
-        for pattern, name in date_patterns:
-            for match in re.finditer(pattern, text):
-                fields.append(ExtractedField(name=name, value=match.group().strip(), type="date"))
-
-        # Amounts (EUR, USD, numbers with currency)
-        amount_pattern = r"(?:EUR|USD|€|\$)\s?[\d.,]+|\b[\d.,]+\s?(?:EUR|USD|€|\$)"
-        for match in re.finditer(amount_pattern, text):
-            fields.append(ExtractedField(name="Amount", value=match.group().strip(), type="amount"))
-
-        # Invoice numbers
-        inv_pattern = r"(?:Invoice|Rechnung|Faktura|INV)[#:\s-]*(\S+)"
-        for match in re.finditer(inv_pattern, text, re.IGNORECASE):
-            fields.append(ExtractedField(name="Invoice Number", value=match.group(1).strip(), type="invoice_number"))
-
-        return fields
+def parse_fields(raw: str) -> List[ExtractedField]:
+    """Read the ``fields`` array from an LLM JSON response."""
+    data = parse_json_object(raw)
+    if data is None:
+        logger.warning("Could not parse field extraction response")
+        return []
+
+    fields_data = data.get("fields", [])
+    if not isinstance(fields_data, list):
+        return []
+
+    result: list[ExtractedField] = []
+    for f in fields_data:
+        if isinstance(f, dict) and "name" in f and "value" in f:
+            result.append(ExtractedField(
+                name=str(f["name"]),
+                value=str(f["value"]),
+                type=str(f.get("type", "string")),
+            ))
+    return result
+
+
+def fallback_fields(text: str) -> List[ExtractedField]:
+    """Regex-based fallback when Ollama is unavailable."""
+    fields: list[ExtractedField] = []
+    for idx in _candidate_rules(text):
+        regex, name, field_type, group = _FALLBACK_RULES[idx]
+        for match in regex.finditer(text):
+            fields.append(ExtractedField(name=name, value=match.group(group).strip(), type=field_type))
+    return fields
+
+
+# (pattern, field name, field type, group holding the value), in output order
+_FALLBACK_RULES = [
+    # IBAN
+    (re.compile(r"\b[A-Z]{2}\d{2}[\s]?[\dA-Z]{4}[\s]?[\dA-Z]{4}[\s]?[\dA-Z]{4}[\s]?[\dA-Z]{0,16}\b"), "IBAN", "iban", 0),
+    # Dates (various formats)
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}\b"), "Date", "date", 0),
+    (re.compile(r"\b\d{2}[./]\d{2}[./]\d{4}\b"), "Date", "date", 0),
+    (re.compile(r"\b\d{2}\.\s?\w+\s?\d{4}\b"), "Date", "date", 0),
+    # Amounts (EUR, USD, numbers with currency)
+    (re.compile(r"(?:EUR|USD|€|\$)\s?[\d.,]+|\b[\d.,]+\s?(?:EUR|USD|€|\$)"), "Amount", "amount", 0),
+    # Invoice numbers
+    (re.compile(r"(?:Invoice|Rechnung|Faktura|INV)[#:\s-]*(\S+)", re.IGNORECASE), "Invoice Number", "invoice_number", 1),
+]
+
+
+@lru_cache(maxsize=1)
+def _prefilter_db():
+    """Hyperscan database telling which fallback rules match at all, or None."""
+    if hyperscan is None:
+        return None
+    flags = []
+    for regex, *_ in _FALLBACK_RULES:
+        # SINGLEMATCH: one report per rule is enough; PREFILTER: never miss a
+        # match Python would find, even where Hyperscan approximates a construct
+        flag = hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_PREFILTER | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+        if regex.flags & re.IGNORECASE:
+            flag |= hyperscan.HS_FLAG_CASELESS
+        flags.append(flag)
+    db = hyperscan.Database()
+    try:
+        db.compile(
+            expressions=[regex.pattern.encode("utf-8") for regex, *_ in _FALLBACK_RULES],
+            ids=list(range(len(_FALLBACK_RULES))),
+            elements=len(_FALLBACK_RULES),
+            flags=flags,
+        )
+    except Exception as e:  # hyperscan.error for constructs it cannot compile
+        logger.warning("Hyperscan prefilter unavailable: %s", e)
+        return None
+    return db
+
+
+def _candidate_rules(text: str) -> List[int]:
+    """Indexes of the fallback rules worth running ``finditer`` for."""
+    db = _prefilter_db()
+    if db is None:
+        return list(range(len(_FALLBACK_RULES)))
+    hits: set[int] = set()
+
+    def on_match(rule_id: int, start: int, end: int, flags: int, context: Any) -> None:
+        hits.add(rule_id)
+
+    # One pass over the text for all rules; Python only re-scans for rules that hit
+    db.scan(text.encode("utf-8", "replace"), match_event_handler=on_match)
+    return sorted(hits)
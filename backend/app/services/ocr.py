@@ -1,22 +1,72 @@
 from __future__ import annotations
 
-import base64
+import hashlib
 import io
 import logging
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Any, List, Tuple, Union
 
-import httpx
 import pytesseract
 from pdf2image import convert_from_path
 from PIL import Image
 
+try:
+    from pybase64 import b64encode_as_string
+except ImportError:  # optional SIMD encoder
+    import base64
+
+    def b64encode_as_string(data) -> str:
+        return base64.b64encode(data).decode("ascii")
+
 from app.config import get_settings
+from app.services.cache import cache_get, cache_set
+from app.services.ollama import get_ollama_client
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+_CPU_COUNT = os.cpu_count() or 1
+
+MIME_BY_EXTENSION = {
+    "pdf": "application/pdf",
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "tiff": "image/tiff",
+    "tif": "image/tiff",
+    "webp": "image/webp",
+    "bmp": "image/bmp",
+    "gif": "image/gif",
+}
+
+# File signatures for names without a known extension
+_MAGIC_NUMBERS = (
+    (b"%PDF", "application/pdf"),
+    (b"\x89PNG", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"GIF8", "image/gif"),
+    (b"BM", "image/bmp"),
+)
+
+# Tesseract output shorter than this goes to the vision model
+_MIN_TEXT_CHARS = 50
+
+# Longest side, in pixels, of images sent to the vision model
+VISION_MAX_SIDE = 1536
+
+# Pages are OCR'd in parallel; keep each tesseract process single-threaded so
+# they do not oversubscribe the cores between them.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+
+def _ocr_page(image: Union[str, Image.Image]) -> str:
+    return pytesseract.image_to_string(image, lang=settings.OCR_LANGUAGE)
+
 
 class OCRService:
     """Extracts text from documents using Tesseract with Ollama vision fallback."""
@@ -31,57 +81,87 @@ class OCRService:
             logger.error("File not found: %s", abs_path)
             return ""
 
+        # Identical bytes give identical text: re-ingesting a file skips OCR
+        with open(abs_path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        # Every setting that changes the output is part of the key
+        cache_key = f"ocr:{settings.OCR_LANGUAGE}:{settings.OCR_DPI}:{settings.OLLAMA_VISION_MODEL}:{digest}"
+        cached = cache_get(cache_key)
+        if cached is not None:
+            return cached.decode("utf-8")
+
+        text, final = self._extract_text_uncached(abs_path)
+        if text and final:
+            cache_set(cache_key, text.encode("utf-8"))
+        return text
+
+    def _extract_text_uncached(self, abs_path: str) -> Tuple[str, bool]:
+        """Return the text and whether it is final; a short result whose vision
+        fallback failed is not, so the next attempt retries the vision pass."""
+        # Detected once, shared by the Tesseract pass and the vision fallback
+        mime = self._detect_mime(abs_path)
         text = ""
         try:
-            text = self._tesseract_ocr(abs_path)
+            text = self._tesseract_ocr(abs_path, mime)
         except Exception as e:
             logger.warning("Tesseract OCR failed for %s: %s", abs_path, e)
 
-        if len(text.strip()) < 50:
+        final = True
+        if len(text.strip()) < _MIN_TEXT_CHARS:
             logger.info("Tesseract result too short (%d chars), trying Ollama vision", len(text.strip()))
             try:
-                vision_text = self._ollama_vision_ocr(abs_path)
+                vision_text = self._ollama_vision_ocr(abs_path, mime)
                 if len(vision_text.strip()) > len(text.strip()):
                     text = vision_text
             except Exception as e:
                 logger.warning("Ollama vision OCR failed for %s: %s", abs_path, e)
+                final = False
 
-        return text.strip()
+        return text.strip(), final
 
     def _resolve_path(self, file_path: str) -> str:
         if os.path.isabs(file_path):
             return file_path
         return os.path.join(settings.MEDIA_DIR, file_path)
 
-    def _tesseract_ocr(self, abs_path: str) -> str:
-        mime = self._detect_mime(abs_path)
-        if mime == "application/pdf" or abs_path.lower().endswith(".pdf"):
-            images = self._pdf_to_images(abs_path)
-            texts: list[str] = []
-            for img in images:
-                page_text = pytesseract.image_to_string(img, lang=settings.OCR_LANGUAGE)
-                texts.append(page_text)
+    def _tesseract_ocr(self, abs_path: str, mime: str) -> str:
+        if mime == "application/pdf":
+            # Pages go to disk as grayscale PNGs and tesseract reads them by
+            # path, so no page is ever held in memory as a PIL image.
+            with tempfile.TemporaryDirectory(prefix="docuai-ocr-") as tmp_dir:
+                pages = self._pdf_to_image_paths(abs_path, tmp_dir)
+                if len(pages) <= 1:
+                    texts = [_ocr_page(page) for page in pages]
+                else:
+                    # Each page is a separate tesseract subprocess, so threads give
+                    # real parallelism (and Celery's daemonic prefork workers may
+                    # not start a process pool)
+                    with ThreadPoolExecutor(max_workers=min(len(pages), _CPU_COUNT)) as pool:
+                        texts = list(pool.map(_ocr_page, pages))
             return "\n\n".join(texts)
         else:
             img = Image.open(abs_path)
             return pytesseract.image_to_string(img, lang=settings.OCR_LANGUAGE)
 
-    def _ollama_vision_ocr(self, abs_path: str) -> str:
-        mime = self._detect_mime(abs_path)
-        if mime == "application/pdf" or abs_path.lower().endswith(".pdf"):
-            images = self._pdf_to_images(abs_path)
+    def _ollama_vision_ocr(self, abs_path: str, mime: str) -> str:
+        if mime == "application/pdf":
+            # Process first page for vision OCR
+            images = self._pdf_to_images(abs_path, first_page=1, last_page=1)
             if not images:
                 return ""
-            # Process first page for vision OCR
             img = images[0]
         else:
             img = Image.open(abs_path)
 
-        # Convert image to base64
+        # Vision models gain nothing above ~1.5K px; a smaller image means a
+        # smaller request body and a shorter prefill
+        img.thumbnail((VISION_MAX_SIDE, VISION_MAX_SIDE), Image.LANCZOS)
+
+        # Convert image to base64, straight from the buffer without a copy
         buf = io.BytesIO()
         img_format = "PNG" if img.mode == "RGBA" else "JPEG"
         img.save(buf, format=img_format)
-        b64_image = base64.b64encode(buf.getvalue()).decode("utf-8")
+        b64_image = b64encode_as_string(buf.getbuffer())
 
         prompt = (
             "Extract ALL text from this document image. Return only the extracted text, "
@@ -89,43 +169,58 @@ class OCRService:
             "Do not add any commentary or explanation."
         )
 
-        response = httpx.post(
-            f"{settings.OLLAMA_URL}/api/generate",
+        response = get_ollama_client().post(
+            "/api/generate",
             json={
                 "model": settings.OLLAMA_VISION_MODEL,
                 "prompt": prompt,
                 "images": [b64_image],
                 "stream": False,
             },
-            timeout=120.0,
         )
         response.raise_for_status()
         data = response.json()
         return data.get("response", "")
 
-    def _pdf_to_images(self, pdf_path: str) -> List[Image.Image]:
+    def _pdf_to_images(self, pdf_path: str, **kwargs: Any) -> List[Image.Image]:
         try:
-            images = convert_from_path(pdf_path, dpi=300)
+            images = convert_from_path(pdf_path, dpi=300, thread_count=_CPU_COUNT, **kwargs)
             return images
         except Exception as e:
             logger.error("pdf2image conversion failed: %s", e)
             return []
 
+    def _pdf_to_image_paths(self, pdf_path: str, output_folder: str) -> List[str]:
+        """Rasterize every page into ``output_folder`` and return the file paths in page order."""
+        try:
+            return convert_from_path(
+                pdf_path,
+                dpi=settings.OCR_DPI,
+                output_folder=output_folder,
+                fmt="png",
+                grayscale=True,
+                paths_only=True,
+                thread_count=_CPU_COUNT,
+            )
+        except Exception as e:
+            logger.error("pdf2image conversion failed: %s", e)
+            return []
+
     def _detect_mime(self, path: str) -> str:
+        # Our own upload path names files by their validated extension, so
+        # that is trusted first; only unknown names get their header sniffed
+        ext = path.rsplit(".", 1)[-1].lower() if "." in path else ""
+        mime = MIME_BY_EXTENSION.get(ext)
+        if mime is not None:
+            return mime
         try:
-            import magic
-            return magic.from_file(path, mime=True)
-        except Exception:
-            ext = path.rsplit(".", 1)[-1].lower() if "." in path else ""
-            mime_map = {
-                "pdf": "application/pdf",
-                "png": "image/png",
-                "jpg": "image/jpeg",
-                "jpeg": "image/jpeg",
-                "tiff": "image/tiff",
-                "tif": "image/tiff",
-                "webp": "image/webp",
-                "bmp": "image/bmp",
-                "gif": "image/gif",
-            }
-            return mime_map.get(ext, "application/octet-stream")
+            with open(path, "rb") as f:
+                header = f.read(16)
+        except OSError:
+            return "application/octet-stream"
+        for signature, mime in _MAGIC_NUMBERS:
+            if header.startswith(signature):
+                return mime
+        if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+            return "image/webp"
+        return "application/octet-stream"
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import logging
+from functools import lru_cache
+
+import httpx
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Rough average for English and code when no tokenizer is configured
+_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=1)
+def get_ollama_client() -> httpx.Client:
+    """Process-wide client so every Ollama call reuses a pooled keep-alive connection.
+
+    Built lazily, so each forked Celery worker opens its own sockets.
+    """
+    return httpx.Client(
+        base_url=settings.OLLAMA_URL,
+        timeout=120.0,
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=16),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_ollama_async_client() -> httpx.AsyncClient:
+    """Shared async client for the API process, closed in the app lifespan."""
+    return httpx.AsyncClient(
+        base_url=settings.OLLAMA_URL,
+        timeout=120.0,
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=10),
+    )
+
+
+@lru_cache(maxsize=1)
+def _get_tokenizer():
+    """The configured Hugging Face tokenizer, or None to estimate by characters."""
+    if not settings.LLM_TOKENIZER:
+        return None
+    try:
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(settings.LLM_TOKENIZER)
+    except Exception as e:
+        logger.warning("Could not load tokenizer %s, estimating by characters: %s", settings.LLM_TOKENIZER, e)
+        return None
+
+
+def truncate_for_prompt(text: str) -> str:
+    """Cut ``text`` to LLM_INPUT_TOKENS, on a token or word boundary."""
+    budget = settings.LLM_INPUT_TOKENS
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        ids = tokenizer.encode(text, add_special_tokens=False, truncation=True, max_length=budget)
+        return tokenizer.decode(ids)
+
+    limit = budget * _CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    # Drop the partial word at the cut rather than hand the model a fragment
+    cut = text.rfind(" ", 0, limit + 1)
+    return text[:cut if cut > 0 else limit]
@@ -2,16 +2,26 @@ from __future__ import annotations
 
 import logging
 import os
+from functools import lru_cache
 from typing import Any, Dict, Optional, Tuple
 
 from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
 
+try:
+    import fitz
+except ImportError:  # optional in-process renderer (PyMuPDF)
+    fitz = None
+
 from app.config import get_settings
+from app.utils.mime import get_magic
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# The setting only admits Pillow filter names, so this lookup cannot fail
+_RESAMPLE = Image.Resampling[settings.PILLOW_RESAMPLE_FILTER]
+
 
 class PDFService:
     """Utilities for PDF and image file processing."""
@@ -31,16 +41,31 @@ class PDFService:
         try:
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-            mime = self._detect_mime(abs_path)
+            mime, _ = _probe(abs_path, os.stat(abs_path).st_mtime_ns)
             if mime == "application/pdf" or abs_path.lower().endswith(".pdf"):
-                images = convert_from_path(abs_path, first_page=1, last_page=1, dpi=150)
-                if not images:
-                    return False
-                img = images[0]
+                if fitz is not None:
+                    img = self._render_first_page(abs_path, size)
+                else:
+                    # An int size scales the longest side, keeping the aspect
+                    # ratio; poppler rasterizes at about the final resolution
+                    # and the thumbnail() below only trims landscape pages
+                    images = convert_from_path(
+                        abs_path,
+                        first_page=1,
+                        last_page=1,
+                        size=max(size),
+                        use_pdftocairo=True,
+                    )
+                    if not images:
+                        return False
+                    img = images[0]
             else:
                 img = Image.open(abs_path)
+                if img.format == "JPEG":
+                    # libjpeg decodes straight to a 1/2, 1/4 or 1/8 scale
+                    img.draft("RGB", size)
 
-            img.thumbnail(size, Image.Resampling.LANCZOS)
+            img.thumbnail(size, _RESAMPLE)
 
             if img.mode == "RGBA":
                 bg = Image.new("RGB", img.size, (255, 255, 255))
@@ -49,7 +74,8 @@ class PDFService:
             elif img.mode != "RGB":
                 img = img.convert("RGB")
 
-            img.save(output_path, "PNG", optimize=True)
+            # Fastest deflate: thumbnails are tiny, so encode time beats bytes
+            img.save(output_path, "PNG", compress_level=1)
             logger.info("Thumbnail generated: %s", output_path)
             return True
 
@@ -57,36 +83,35 @@ class PDFService:
             logger.exception("Thumbnail generation failed for %s: %s", abs_path, e)
             return False
 
+    def _render_first_page(self, abs_path: str, size: Tuple[int, int]) -> Image.Image:
+        """Rasterize page 1 in-process, already scaled to fit ``size``."""
+        with fitz.open(abs_path) as pdf:
+            page = pdf.load_page(0)
+            zoom = min(size[0] / page.rect.width, size[1] / page.rect.height)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
     def get_page_count(self, file_path: str) -> int:
         """Get the number of pages in a document."""
         abs_path = self._resolve_path(file_path)
-        if not os.path.exists(abs_path):
+        try:
+            st = os.stat(abs_path)
+        except OSError:
             return 0
-
-        mime = self._detect_mime(abs_path)
-        if mime == "application/pdf" or abs_path.lower().endswith(".pdf"):
-            try:
-                info = pdfinfo_from_path(abs_path)
-                return int(info.get("Pages", 0))
-            except Exception as e:
-                logger.warning("Could not get PDF page count: %s", e)
-                return 0
-        else:
-            # Image files are 1 page
-            return 1
+        return _probe(abs_path, st.st_mtime_ns)[1]
 
     def get_file_info(self, file_path: str) -> Dict[str, Any]:
         """Get file metadata: size, mime_type, pages."""
         abs_path = self._resolve_path(file_path)
-        if not os.path.exists(abs_path):
+        try:
+            st = os.stat(abs_path)
+        except OSError:
             return {"size": 0, "mime_type": "unknown", "pages": 0}
 
-        size = os.path.getsize(abs_path)
-        mime = self._detect_mime(abs_path)
-        pages = self.get_page_count(file_path)
+        mime, pages = _probe(abs_path, st.st_mtime_ns)
 
         return {
-            "size": size,
+            "size": st.st_size,
             "mime_type": mime,
             "pages": pages,
         }
@@ -96,21 +121,42 @@ class PDFService:
             return file_path
         return os.path.join(settings.MEDIA_DIR, file_path)
 
-    def _detect_mime(self, path: str) -> str:
+
+def _detect_mime(path: str) -> str:
+    detector = get_magic()
+    try:
+        if detector is None:
+            raise RuntimeError("libmagic unavailable")
+        return detector.from_file(path)
+    except Exception:
+        ext = path.rsplit(".", 1)[-1].lower() if "." in path else ""
+        mime_map = {
+            "pdf": "application/pdf",
+            "png": "image/png",
+            "jpg": "image/jpeg",
+            "jpeg": "image/jpeg",
+            "tiff": "image/tiff",
+            "tif": "image/tiff",
+            "webp": "image/webp",
+            "bmp": "image/bmp",
+            "gif": "image/gif",
+        }
+        return mime_map.get(ext, "application/octet-stream")
+
+
+@lru_cache(maxsize=256)
+def _probe(abs_path: str, mtime_ns: int) -> Tuple[str, int]:
+    """(mime type, page count) of a file, sniffed and counted once per version.
+
+    ``mtime_ns`` is only part of the cache key, so a rewritten file misses.
+    """
+    mime = _detect_mime(abs_path)
+    if mime == "application/pdf" or abs_path.lower().endswith(".pdf"):
         try:
-            import magic
-            return magic.from_file(path, mime=True)
-        except Exception:
-            ext = path.rsplit(".", 1)[-1].lower() if "." in path else ""
-            mime_map = {
-                "pdf": "application/pdf",
-                "png": "image/png",
-                "jpg": "image/jpeg",
-                "jpeg": "image/jpeg",
-                "tiff": "image/tiff",
-                "tif": "image/tiff",
-                "webp": "image/webp",
-                "bmp": "image/bmp",
-                "gif": "image/gif",
-            }
-            return mime_map.get(ext, "application/octet-stream")
+            info = pdfinfo_from_path(abs_path)
+            return mime, int(info.get("Pages", 0))
+        except Exception as e:
+            logger.warning("Could not get PDF page count: %s", e)
+            return mime, 0
+    # Image files are 1 page
+    return mime, 1
@@ -2,26 +2,50 @@ from __future__ import annotations
 
 import logging
 import uuid
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
 
 import httpx
-from sqlalchemy import select
+import orjson
+from pgvector.sqlalchemy import HALFVEC
+from sqlalchemy import Float, cast, func, literal, select
+from sqlalchemy.dialects.postgresql import BIT
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import get_settings
-from app.models import Document
+from app.database import set_hnsw_ef_search
+from app.models import Document, DocumentStatus
 from app.schemas import ChatSource
-from app.services.embeddings import EmbeddingService
+from app.services.embeddings import get_embedding_service
+from app.services.ollama import get_ollama_async_client
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
 
+# Only what the prompt and the citations need; Postgres truncates the content
+_SOURCE_COLUMNS = (
+    Document.id,
+    Document.title,
+    Document.original_filename,
+    func.substr(Document.content, 1, 800).label("snippet"),
+)
+
+# (id, title, original_filename, snippet, distance)
+SourceRow = Tuple[uuid.UUID, Optional[str], str, Optional[str], float]
+
+
+class Retrieval(NamedTuple):
+    context: str
+    sources: List[ChatSource]
+    # Canned answer when nothing relevant was found; skips the LLM
+    reply: Optional[str] = None
+
+
 class RAGService:
     """Retrieval-Augmented Generation for document Q&A."""
 
     def __init__(self) -> None:
-        self.embedding_service = EmbeddingService()
+        self.embedding_service = get_embedding_service()
 
     async def answer(self, question: str, db: AsyncSession) -> Dict[str, Any]:
         """
@@ -32,53 +56,76 @@ class RAGService:
         4. Send to Ollama
         5. Return answer with sources
         """
+        retrieval = await self.retrieve(question, db)
+        answer_text = "".join([chunk async for chunk in self.stream_answer(question, retrieval)])
+        return {
+            "answer": answer_text,
+            "sources": retrieval.sources,
+        }
+
+    async def retrieve(self, question: str, db: AsyncSession) -> Retrieval:
+        """Steps 1-3: the context and sources for ``question``, or a canned reply."""
         # 1. Embed the question
-        query_embedding = self.embedding_service.embed_text(question)
+        query_embedding = self.embedding_service.embed_query(question)
 
         # 2. Find similar documents
-        stmt = (
-            select(
-                Document,
-                Document.embedding.cosine_distance(query_embedding).label("distance"),
+        if settings.USEARCH_ENABLED:
+            rows = await self._search_usearch(query_embedding, db)
+        elif settings.BINARY_QUANTIZE_SEARCH:
+            rows = await self._search_binary_quantized(query_embedding, db)
+        else:
+            await set_hnsw_ef_search(db)
+            # ORDER BY the bare <=> expression so the planner matches the HNSW index
+            distance = Document.embedding.cosine_distance(query_embedding)
+            stmt = (
+                select(*_SOURCE_COLUMNS, distance.label("distance"))
+                # Matches the predicate of the partial HNSW index
+                .where(Document.status == DocumentStatus.done)
+                .where(Document.embedding.isnot(None))
+                .order_by(distance)
+                .limit(5)
             )
-            .where(Document.embedding.isnot(None))
-            .order_by("distance")
-            .limit(5)
-        )
-        result = await db.execute(stmt)
-        rows = result.all()
+            result = await db.execute(stmt)
+            rows = result.all()
 
         if not rows:
-            return {
-                "answer": "I don't have any documents to search through yet. Please upload some documents first.",
-                "sources": [],
-            }
+            return Retrieval(
+                context="",
+                sources=[],
+                reply="I don't have any documents to search through yet. Please upload some documents first.",
+            )
 
         # 3. Build context from matched documents
         context_parts: list[str] = []
         sources: list[ChatSource] = []
-        for doc, distance in rows:
+        for doc_id, title, filename, snippet, distance in rows:
             similarity = 1 - (distance if distance is not None else 1.0)
             if similarity < 0.1:
                 continue
-            snippet = (doc.content or "")[:800]
-            title = doc.title or doc.original_filename
+            snippet = snippet or ""
+            title = title or filename
             context_parts.append(f"[Document: {title}]\n{snippet}")
             sources.append(ChatSource(
-                doc_id=doc.id,
+                doc_id=doc_id,
                 title=title,
                 snippet=snippet[:200],
             ))
 
         if not context_parts:
-            return {
-                "answer": "I couldn't find any relevant documents for your question. Try rephrasing or uploading more documents.",
-                "sources": [],
-            }
+            return Retrieval(
+                context="",
+                sources=[],
+                reply="I couldn't find any relevant documents for your question. Try rephrasing or uploading more documents.",
+            )
+
+        return Retrieval(context="\n\n---\n\n".join(context_parts), sources=sources)
 
-        context = "\n\n---\n\n".join(context_parts)
+    async def stream_answer(self, question: str, retrieval: Retrieval) -> AsyncIterator[str]:
+        """Step 4: yield the answer in the chunks Ollama generates it. Needs no session."""
+        if retrieval.reply is not None:
+            yield retrieval.reply
+            return
 
-        # 4. Send to Ollama
         system_prompt = (
             "You are a helpful document assistant. Answer questions based ONLY on the provided document context. "
             "If the context doesn't contain enough information to answer the question, say so clearly. "
@@ -87,37 +134,87 @@ class RAGService:
         )
 
         user_prompt = f"""Context from documents:
-{context}
+{retrieval.context}
 
 Question: {question}
 
 Answer based on the documents above:"""
 
+        produced = False
         try:
-            response = httpx.post(
-                f"{settings.OLLAMA_URL}/api/generate",
+            async with get_ollama_async_client().stream(
+                "POST",
+                "/api/generate",
                 json={
                     "model": settings.OLLAMA_MODEL,
                     "system": system_prompt,
                     "prompt": user_prompt,
-                    "stream": False,
+                    "stream": True,
                 },
-                timeout=120.0,
-            )
-            response.raise_for_status()
-            data = response.json()
-            answer_text = data.get("response", "Sorry, I couldn't generate an answer.")
+            ) as response:
+                response.raise_for_status()
+                # NDJSON: one object per generated chunk, the last has "done"
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    data = orjson.loads(line)
+                    if data.get("response"):
+                        produced = True
+                        yield data["response"]
+                    if data.get("done"):
+                        break
+            if not produced:
+                yield "Sorry, I couldn't generate an answer."
         except httpx.ConnectError:
             logger.warning("Ollama not available for RAG")
-            answer_text = (
+            yield (
                 "The AI model is currently unavailable. Here are the most relevant documents I found:\n\n"
-                + "\n".join(f"- {s.title}: {s.snippet}" for s in sources)
+                + "\n".join(f"- {s.title}: {s.snippet}" for s in retrieval.sources)
             )
         except Exception as e:
             logger.exception("Ollama RAG error: %s", e)
-            answer_text = f"Error generating answer: {str(e)}"
-
-        return {
-            "answer": answer_text,
-            "sources": sources,
-        }
+            yield f"Error generating answer: {str(e)}"
+
+    @staticmethod
+    async def _search_binary_quantized(query_embedding: List[float], db: AsyncSession) -> List[SourceRow]:
+        """Shortlist by Hamming distance on the bit index, then rerank by cosine."""
+        # Both sides must match the expression of ix_documents_embedding_bq_hnsw
+        doc_bits = cast(func.binary_quantize(Document.embedding), BIT(384))
+        query_bits = cast(func.binary_quantize(literal(query_embedding, HALFVEC(384))), BIT(384))
+        candidates = (
+            select(Document.id)
+            .where(Document.status == DocumentStatus.done)
+            .where(Document.embedding.isnot(None))
+            .order_by(doc_bits.op("<~>", return_type=Float)(query_bits))
+            .limit(settings.BINARY_QUANTIZE_CANDIDATES)
+        )
+        await set_hnsw_ef_search(db)
+        distance = Document.embedding.cosine_distance(query_embedding)
+        result = await db.execute(
+            select(*_SOURCE_COLUMNS, distance.label("distance"))
+            .where(Document.id.in_(candidates.scalar_subquery()))
+            .order_by(distance)
+            .limit(5)
+        )
+        return result.all()
+
+    @staticmethod
+    async def _search_usearch(query_embedding: List[float], db: AsyncSession) -> List[SourceRow]:
+        """Rank with the USearch sidecar, then load the matching rows from Postgres."""
+        from app.services.vector_index import get_vector_index
+
+        index = get_vector_index()
+        await index.sync(db)
+        # Over-fetch: hits deleted since the last sync are filtered out below
+        hits = index.search(query_embedding, 10)
+        if not hits:
+            return []
+        result = await db.execute(
+            select(*_SOURCE_COLUMNS)
+            .where(Document.id.in_(list(hits)))
+            .where(Document.status == DocumentStatus.done)
+        )
+        rows = result.all()
+        found = {row[0] for row in rows}
+        index.forget(doc_id for doc_id in hits if doc_id not in found)
+        return sorted(((*row, hits[row[0]]) for row in rows), key=lambda row: row[-1])[:5]
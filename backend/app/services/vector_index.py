@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import Text, cast, literal_column, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import Document, DocumentStatus
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+# Transaction id that last wrote the row, stamped by migration 014's trigger.
+# SQLAlchemy has no xid8 type, so it is read and compared as text.
+_INDEX_XID = cast(literal_column("documents.index_xid"), Text)
+
+
+class VectorIndexService:
+    """In-process USearch mirror of the embeddings of finished documents.
+
+    Postgres stays the source of truth: this index only answers "which ids are
+    nearest", and callers load the rows back from Postgres. Rows that leave
+    ``done`` are dropped on the next sync; deleted rows are dropped when a
+    search finds them missing (see :meth:`forget`).
+    """
+
+    def __init__(self) -> None:
+        from usearch.index import Index
+
+        # Same graph shape as the pgvector HNSW index, stored as FP16
+        self._index = Index(
+            ndim=384,
+            metric="cos",
+            dtype="f16",
+            connectivity=24,
+            expansion_add=128,
+            expansion_search=settings.HNSW_EF_SEARCH,
+        )
+        # USearch keys are uint64, document ids are UUIDs
+        self._keys: Dict[uuid.UUID, int] = {}
+        self._ids: Dict[int, uuid.UUID] = {}
+        # index_xid each indexed row had when it was added
+        self._versions: Dict[uuid.UUID, str] = {}
+        self._next_key = 0
+        self._watermark: Optional[str] = None
+        self._lock = asyncio.Lock()
+
+    async def sync(self, db: AsyncSession) -> int:
+        """Apply rows written since the last sync; return how many were indexed."""
+        async with self._lock:
+            # Every transaction below this snapshot's xmin has finished, so
+            # whatever it wrote is visible to the read that follows. Newer
+            # ones may still be open; they are read again on the next sync.
+            horizon = (
+                await db.execute(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text"))
+            ).scalar_one()
+
+            stmt = select(Document.id, Document.status, Document.embedding, _INDEX_XID.label("xid"))
+            if self._watermark is None:
+                stmt = stmt.where(Document.status == DocumentStatus.done).where(Document.embedding.isnot(None))
+            else:
+                stmt = stmt.where(
+                    text("documents.index_xid >= CAST(:watermark AS xid8)").bindparams(watermark=self._watermark)
+                )
+            rows = (await db.execute(stmt)).all()
+            self._watermark = horizon
+
+            keys: List[int] = []
+            vectors: List[np.ndarray] = []
+            stale: List[int] = []
+            for doc_id, status, embedding, xid in rows:
+                if self._versions.get(doc_id) == xid:
+                    # Read again only because its transaction was still open
+                    continue
+                key = self._keys.get(doc_id)
+                if key is not None:
+                    stale.append(key)
+                if status != DocumentStatus.done or embedding is None:
+                    if key is not None:
+                        self._drop(doc_id)
+                    continue
+                if key is None:
+                    key = self._next_key
+                    self._next_key += 1
+                    self._keys[doc_id] = key
+                    self._ids[key] = doc_id
+                self._versions[doc_id] = xid
+                keys.append(key)
+                vectors.append(embedding.to_numpy())
+
+            if stale:
+                self._index.remove(np.asarray(stale, dtype=np.uint64))
+            if keys:
+                self._index.add(np.asarray(keys, dtype=np.uint64), np.stack(vectors).astype(np.float16))
+                logger.info("USearch index synced %d embeddings (%d total)", len(keys), len(self._index))
+            return len(keys)
+
+    def forget(self, doc_ids: Iterable[uuid.UUID]) -> None:
+        """Remove documents Postgres no longer returns, e.g. deleted ones."""
+        keys = [key for key in (self._drop(doc_id) for doc_id in doc_ids) if key is not None]
+        if keys:
+            self._index.remove(np.asarray(keys, dtype=np.uint64))
+
+    def _drop(self, doc_id: uuid.UUID) -> Optional[int]:
+        key = self._keys.pop(doc_id, None)
+        if key is not None:
+            del self._ids[key]
+        self._versions.pop(doc_id, None)
+        return key
+
+    def search(self, query_embedding: List[float], k: int) -> Dict[uuid.UUID, float]:
+        """Return up to ``k`` nearest document ids mapped to their cosine distance."""
+        if len(self._index) == 0:
+            return {}
+        matches = self._index.search(np.asarray(query_embedding, dtype=np.float16), k)
+        return {
+            self._ids[int(key)]: float(distance)
+            for key, distance in zip(matches.keys, matches.distances)
+        }
+
+
+@lru_cache(maxsize=1)
+def get_vector_index() -> VectorIndexService:
+    return VectorIndexService()
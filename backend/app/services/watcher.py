@@ -1,20 +1,49 @@
 from __future__ import annotations
 
+import contextlib
+import errno
 import logging
 import os
 import shutil
+import sys
+import threading
 import time
 import uuid
 from datetime import datetime
 
-from watchdog.events import FileSystemEventHandler, FileCreatedEvent
+from watchdog.events import FileClosedEvent, FileCreatedEvent, FileMovedEvent, FileSystemEventHandler
 from watchdog.observers import Observer
 
 from app.config import get_settings
+from app.utils.mime import get_magic
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# inotify reports IN_CLOSE_WRITE, so a file is taken as soon as its writer
+# closes it; other platforms poll the size until it stops changing
+_CLOSE_EVENTS = sys.platform.startswith("linux")
+# A created file with no close by then was moved in rather than written
+_CLOSE_GRACE_SECONDS = 2.0
+
+
+def _move_file(source_path: str, dest_path: str) -> None:
+    """Rename when consume and media share a filesystem, copy across otherwise."""
+    try:
+        os.replace(source_path, dest_path)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    # copyfile uses sendfile on Linux, so the data never enters Python
+    try:
+        shutil.copyfile(source_path, dest_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(dest_path)
+        raise
+    os.unlink(source_path)
+
 
 class _NewFileHandler(FileSystemEventHandler):
     """Handles new files appearing in the consume directory."""
@@ -24,27 +53,79 @@ class _NewFileHandler(FileSystemEventHandler):
     def __init__(self) -> None:
         super().__init__()
         self.ALLOWED_EXTENSIONS = set(settings.ALLOWED_EXTENSIONS)
-        self._engine = None
+        from sqlalchemy import create_engine
+
+        # Built up front: files are handled on the observer thread and on
+        # grace-period timer threads, which must not race to create it
+        self._engine = create_engine(settings.SYNC_DATABASE_URL, pool_pre_ping=True, pool_size=2)
+        self._made_dirs: set[str] = set()
+        self._lock = threading.Lock()
+        # Created files whose writer has not closed them yet
+        self._awaiting_close: dict[str, threading.Timer] = {}
 
     def on_created(self, event: FileCreatedEvent) -> None:  # type: ignore[override]
-        if event.is_directory:
+        if event.is_directory or not self._is_allowed(event.src_path):
             return
 
         file_path = event.src_path
-        filename = os.path.basename(file_path)
-        ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+        logger.info("New file detected: %s", file_path)
 
-        if ext not in self.ALLOWED_EXTENSIONS:
-            logger.info("Ignoring file with extension '.%s': %s", ext, filename)
+        if not _CLOSE_EVENTS:
+            # Wait for write to complete (check file size stability)
+            self._wait_for_write(file_path)
+            self._handle(file_path)
             return
 
-        logger.info("New file detected: %s", file_path)
+        # Written in place: on_closed takes it. Moved in from elsewhere:
+        # inotify reports only the create, so fall back after a grace period.
+        timer = threading.Timer(_CLOSE_GRACE_SECONDS, self._close_timed_out, args=(file_path,))
+        timer.daemon = True
+        with self._lock:
+            self._awaiting_close[file_path] = timer
+        timer.start()
 
-        # Wait for write to complete (check file size stability)
-        self._wait_for_write(file_path)
+    def on_closed(self, event: FileClosedEvent) -> None:  # type: ignore[override]
+        if event.is_directory:
+            return
+        if self._claim(event.src_path):
+            self._handle(event.src_path)
 
+    def on_moved(self, event: FileMovedEvent) -> None:  # type: ignore[override]
+        if event.is_directory:
+            return
+        # Written under a temporary name and renamed into place: already complete
+        self._claim(event.src_path)
+        if self._is_allowed(event.dest_path):
+            logger.info("New file detected: %s", event.dest_path)
+            self._claim(event.dest_path)
+            self._handle(event.dest_path)
+
+    def _is_allowed(self, file_path: str) -> bool:
+        filename = os.path.basename(file_path)
+        ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+        if ext not in self.ALLOWED_EXTENSIONS:
+            logger.info("Ignoring file with extension '.%s': %s", ext, filename)
+            return False
+        return True
+
+    def _claim(self, file_path: str) -> bool:
+        """Take ``file_path`` off the awaiting-close list; only one caller wins."""
+        with self._lock:
+            timer = self._awaiting_close.pop(file_path, None)
+        if timer is None:
+            return False
+        timer.cancel()
+        return True
+
+    def _close_timed_out(self, file_path: str) -> None:
+        if self._claim(file_path):
+            # Either moved in whole or still being written slowly
+            self._wait_for_write(file_path)
+            self._handle(file_path)
+
+    def _handle(self, file_path: str) -> None:
         try:
-            self._process_new_file(file_path, filename)
+            self._process_new_file(file_path, os.path.basename(file_path))
         except Exception as e:
             logger.exception("Error processing watched file %s: %s", file_path, e)
 
@@ -76,27 +157,26 @@ class _NewFileHandler(FileSystemEventHandler):
         relative_path = os.path.join(year_month, unique_name)
         dest_path = os.path.join(settings.MEDIA_DIR, relative_path)
 
-        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-        shutil.move(source_path, dest_path)
+        dest_dir = os.path.dirname(dest_path)
+        if dest_dir not in self._made_dirs:
+            os.makedirs(dest_dir, exist_ok=True)
+            self._made_dirs.add(dest_dir)
+        _move_file(source_path, dest_path)
         logger.info("Moved %s → %s", source_path, dest_path)
 
         file_size = os.path.getsize(dest_path)
 
         # Detect MIME type
+        detector = get_magic()
         try:
-            import magic
-            mime_type = magic.from_file(dest_path, mime=True)
+            mime_type = detector.from_file(dest_path) if detector else "application/octet-stream"
         except Exception:
             mime_type = "application/octet-stream"
 
         # Create DB entry using sync session (watcher runs as standalone process)
-        from sqlalchemy import create_engine
         from sqlalchemy.orm import Session
         from app.models import Document, DocumentStatus
 
-        if not hasattr(self, '_engine') or self._engine is None:
-            self._engine = create_engine(settings.SYNC_DATABASE_URL, pool_pre_ping=True, pool_size=2)
-
         doc_id = uuid.uuid4()
         with Session(self._engine) as session:
             doc = Document(
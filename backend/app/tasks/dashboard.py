@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import logging
+
+import redis
+
+from app.celery_app import celery_app
+from app.services.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Documents finished or deleted within this window share one refresh
+REFRESH_DELAY = 30
+_PENDING_KEY = "docuai:month_counts_refresh_pending"
+
+
+def schedule_month_counts_refresh() -> None:
+    """Queue a refresh of the dashboard month counts unless one is already pending."""
+    try:
+        # The expiry only matters if the queued refresh is lost
+        if not get_redis().set(_PENDING_KEY, b"1", nx=True, ex=REFRESH_DELAY * 10):
+            return
+    except redis.RedisError as e:
+        logger.warning("Could not check for a pending month-count refresh: %s", e)
+    celery_app.send_task("app.tasks.process.refresh_month_counts", countdown=REFRESH_DELAY)
+
+
+def clear_pending_refresh() -> None:
+    """Called as the refresh starts, so later changes schedule another one."""
+    try:
+        get_redis().delete(_PENDING_KEY)
+    except redis.RedisError as e:
+        logger.warning("Could not clear the pending month-count refresh: %s", e)
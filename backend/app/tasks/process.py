@@ -2,12 +2,18 @@ from __future__ import annotations
 
 import logging
 import os
-import re
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from sqlalchemy import create_engine, select
-from sqlalchemy.orm import Session
+from celery import chain, chord
+from celery.exceptions import Ignore
+from celery.signals import worker_process_init
+from sqlalchemy import create_engine, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.celery_app import celery_app
 from app.config import get_settings
@@ -21,6 +27,8 @@ from app.models import (
     ProcessingLog,
     Tag,
 )
+from app.tasks.dashboard import clear_pending_refresh, schedule_month_counts_refresh
+from app.utils.slug import slugify
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -35,70 +43,250 @@ _sync_engine = create_engine(
 )
 
 
-def _get_sync_session() -> Session:
-    return Session(_sync_engine)
+# Tasks write their changes at explicit commit points, and the objects they
+# hold stay valid after a commit without a reload.
+SessionLocal = sessionmaker(_sync_engine, expire_on_commit=False, autoflush=False)
+
+
+@worker_process_init.connect
+def _warm_db_pool(**kwargs) -> None:
+    """Drop connections inherited over fork, then open one for the first task."""
+    _sync_engine.dispose(close=False)
+    try:
+        with _sync_engine.connect():
+            pass
+    except Exception:
+        logger.exception("Could not connect to the database at worker start")
+
+
+@worker_process_init.connect
+def _preload_models(**kwargs) -> None:
+    """Load the embedding model in each worker child before it takes a task."""
+    if not settings.PRELOAD_EMBEDDINGS:
+        return
+    try:
+        from app.services.embeddings import get_embedding_service
+        get_embedding_service().preload()
+    except Exception:
+        logger.exception("Could not preload the embedding model")
+
+
+# Reprocessing embeds here, overlapping the LLM call on the task thread.
+# Threads start on first use, after the fork.
+_step_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="process-step")
 
 
 def _slugify(name: str) -> str:
-    slug = name.lower().strip()
-    slug = re.sub(r"[^\w\s-]", "", slug)
-    slug = re.sub(r"[\s_]+", "-", slug)
-    slug = re.sub(r"-+", "-", slug).strip("-")
-    return slug or "untitled"
+    # Same slugs as the API endpoints, so LLM suggestions match manual entries
+    return slugify(name) or "untitled"
+
+
+# Seconds a worker reuses the taxonomy names it passes to the LLM as hints
+_NAMES_TTL = 30.0
+_names_cache: Dict[str, Tuple[float, List[str]]] = {}
+
+
+def _existing_names(session: Session, model) -> List[str]:
+    """Names of all rows of ``model``, cached per process for _NAMES_TTL seconds."""
+    key = model.__tablename__
+    cached = _names_cache.get(key)
+    now = time.monotonic()
+    if cached is not None and now - cached[0] < _NAMES_TTL:
+        return cached[1]
+    names = list(session.scalars(select(model.name)))
+    _names_cache[key] = (now, names)
+    return names
+
+
+def _ids_by_slug(session: Session, model, names: Dict[str, str], **defaults) -> Dict[str, int]:
+    """Map each slug in ``{slug: name}`` to its row id, creating missing rows.
+
+    One SELECT when everything exists; otherwise one multi-row INSERT for the
+    rest. ON CONFLICT covers rows another worker created in between, which
+    RETURNING skips, so those few are read back afterwards.
+    """
+    ids = dict(session.execute(select(model.slug, model.id).where(model.slug.in_(names))).all())
+    missing = [slug for slug in names if slug not in ids]
+    if missing:
+        inserted = session.execute(
+            pg_insert(model.__table__)
+            .values([{"name": names[slug], "slug": slug, **defaults} for slug in missing])
+            .on_conflict_do_nothing(index_elements=["slug"])
+            .returning(model.slug, model.id)
+        ).all()
+        ids.update(inserted)
+        if inserted:
+            # New names must show up in the next document's hints
+            _names_cache.pop(model.__tablename__, None)
+        if len(inserted) < len(missing):
+            ids.update(session.execute(
+                select(model.slug, model.id).where(model.slug.in_([s for s in missing if s not in ids]))
+            ).all())
+    return ids
+
+
+def _insert_fields(session: Session, document_id: uuid.UUID, fields) -> None:
+    """Store extracted fields with one executemany INSERT, skipping the ORM."""
+    if not fields:
+        return
+    session.execute(
+        insert(CustomField.__table__),
+        [
+            {
+                "document_id": document_id,
+                "field_name": field.name,
+                "field_value": field.value,
+                "field_type": field.type,
+            }
+            for field in fields
+        ],
+    )
+
+
+def _make_thumbnail(file_path: str, doc_uuid: uuid.UUID) -> Tuple[Optional[str], Dict[str, Any]]:
+    """Render the thumbnail and probe the file: (thumbnail name or None, file info)."""
+    from app.services.pdf import PDFService
+    pdf_service = PDFService()
+
+    thumb_relative = f"{doc_uuid.hex}.png"
+    thumb_abs = os.path.join(settings.THUMBNAIL_DIR, thumb_relative)
+    os.makedirs(settings.THUMBNAIL_DIR, exist_ok=True)
+
+    success = pdf_service.generate_thumbnail(file_path, thumb_abs)
+    return (thumb_relative if success else None), pdf_service.get_file_info(file_path)
+
+
+def _refresh_month_counts() -> None:
+    # CONCURRENTLY keeps the dashboard readable while the view is rebuilt
+    with _sync_engine.begin() as conn:
+        conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY doc_month_counts"))
+
+
+def _schedule_month_counts() -> None:
+    # Each refresh rescans documents; a batch of uploads shares one
+    try:
+        schedule_month_counts_refresh()
+    except Exception:
+        logger.exception("Could not schedule a dashboard month-count refresh")
 
 
 def _log_step(session: Session, document_id: uuid.UUID, step: str, status: str, message: str = "") -> None:
-    log = ProcessingLog(
-        document_id=document_id,
-        step=step,
-        status=status,
-        message=message,
-    )
-    session.add(log)
-    session.flush()
+    # Buffered; _commit writes the task's steps in one INSERT. They were only
+    # visible after the commit anyway.
+    session.info.setdefault("step_logs", []).append({
+        "document_id": document_id,
+        "step": step,
+        "status": status,
+        "message": message,
+    })
+
+
+def _commit(session: Session) -> None:
+    """Write the buffered processing logs, then commit."""
+    logs = session.info.pop("step_logs", None)
+    if logs:
+        session.execute(insert(ProcessingLog.__table__), logs)
+    session.commit()
+
+
+def _fail(session: Session, doc_uuid: uuid.UUID, exc: Exception) -> None:
+    """Mark the document failed after an unexpected error; the task then retries."""
+    try:
+        doc = session.execute(select(Document).where(Document.id == doc_uuid)).scalar_one_or_none()
+        if doc:
+            doc.status = DocumentStatus.error
+            _log_step(session, doc_uuid, "fatal", "error", str(exc))
+            _commit(session)
+            _schedule_month_counts()
+    except Exception:
+        session.rollback()
 
 
-@celery_app.task(name="app.tasks.process.process_document", bind=True, max_retries=3)
-def process_document(self, document_id: str) -> dict:
-    """Full document processing pipeline: OCR → classify → fields → embeddings → thumbnail."""
+def _run_step(task, document_id: str, body: Callable[[Session, Document], None]) -> None:
+    """Load the document, apply ``body`` and commit. Unexpected errors retry ``task``."""
     doc_uuid = uuid.UUID(document_id)
-    session = _get_sync_session()
-
+    session = SessionLocal()
     try:
         doc = session.execute(select(Document).where(Document.id == doc_uuid)).scalar_one_or_none()
         if doc is None:
             logger.error("Document %s not found", document_id)
-            return {"status": "error", "message": "Document not found"}
+            raise Ignore()
+        body(session, doc)
+        _commit(session)
+    except Ignore:
+        raise
+    except Exception as e:
+        logger.exception("Unhandled error processing document %s", document_id)
+        _fail(session, doc_uuid, e)
+        raise task.retry(exc=e, countdown=60)
+    finally:
+        session.close()
 
-        doc.status = DocumentStatus.processing
-        session.flush()
-        _log_step(session, doc_uuid, "start", "info", "Processing started")
 
-        # ── Step 1: OCR ─────────────────────────────────────────────────────
+@celery_app.task(name="app.tasks.process.process_document")
+def process_document(document_id: str) -> dict:
+    """Full document processing pipeline: OCR → (classify + fields | embeddings | thumbnail) → finalize."""
+    # OCR runs on its own queue; the steps after it only need its text or the
+    # file, so they run as a chord on whichever default-queue workers are free.
+    chain(
+        ocr_document.si(document_id),
+        chord(
+            [
+                analyze_document.si(document_id),
+                embed_document.si(document_id),
+                thumbnail_document.si(document_id),
+            ],
+            finalize_document.s(document_id),
+        ),
+    ).apply_async()
+    return {"status": "queued", "document_id": document_id}
+
+
+@celery_app.task(name="app.tasks.process.ocr_document", bind=True, max_retries=3)
+def ocr_document(self, document_id: str) -> None:
+    """Step 1: extract the text. A failure ends the pipeline here."""
+
+    def body(session: Session, doc: Document) -> None:
+        doc.status = DocumentStatus.processing
+        _log_step(session, doc.id, "start", "info", "Processing started")
         try:
             from app.services.ocr import OCRService
-            ocr = OCRService()
-            text = ocr.extract_text(doc.file_path)
+            text = OCRService().extract_text(doc.file_path)
             doc.content = text
-            session.flush()
-            _log_step(session, doc_uuid, "ocr", "success", f"Extracted {len(text)} characters")
+            _log_step(session, doc.id, "ocr", "success", f"Extracted {len(text)} characters")
         except Exception as e:
             logger.exception("OCR failed for %s", document_id)
-            _log_step(session, doc_uuid, "ocr", "error", str(e))
+            _log_step(session, doc.id, "ocr", "error", str(e))
             doc.status = DocumentStatus.error
-            session.commit()
-            return {"status": "error", "step": "ocr", "message": str(e)}
+            _commit(session)
+            _schedule_month_counts()
+            # Skips the rest of the chain without a retry
+            raise Ignore()
+
+    _run_step(self, document_id, body)
+
+
+@celery_app.task(name="app.tasks.process.analyze_document", bind=True, max_retries=3)
+def analyze_document(self, document_id: str) -> None:
+    """Step 2: classification and field extraction, from one LLM call."""
+
+    def body(session: Session, doc: Document) -> None:
+        doc_uuid = doc.id
+        text = doc.content or ""
+        extracted_fields = None
 
-        # ── Step 2: Classification ──────────────────────────────────────────
         try:
-            from app.services.classifier import ClassifierService
-            classifier = ClassifierService()
+            from app.services.extraction import ExtractionService
+            extraction_service = ExtractionService()
 
-            existing_tags = [t.name for t in session.execute(select(Tag)).scalars().all()]
-            existing_types = [t.name for t in session.execute(select(DocumentType)).scalars().all()]
-            existing_corr = [c.name for c in session.execute(select(Correspondent)).scalars().all()]
+            existing_tags = _existing_names(session, Tag)
+            existing_types = _existing_names(session, DocumentType)
+            existing_corr = _existing_names(session, Correspondent)
 
-            result = classifier.classify(text, existing_tags, existing_types, existing_corr)
+            # One LLM call returns the classification and the fields together
+            extraction = extraction_service.extract_all(text, existing_tags, existing_types, existing_corr)
+            result = extraction.classification
+            extracted_fields = extraction.fields
 
             if result.title:
                 doc.title = result.title
@@ -112,137 +300,109 @@ def process_document(self, document_id: str) -> dict:
             # Document type
             if result.document_type:
                 slug = _slugify(result.document_type)
-                dt = session.execute(select(DocumentType).where(DocumentType.slug == slug)).scalar_one_or_none()
-                if dt is None:
-                    dt = DocumentType(name=result.document_type, slug=slug)
-                    session.add(dt)
-                    session.flush()
-                doc.document_type_id = dt.id
+                doc.document_type_id = _ids_by_slug(session, DocumentType, {slug: result.document_type})[slug]
 
             # Correspondent
             if result.correspondent:
                 slug = _slugify(result.correspondent)
-                corr = session.execute(select(Correspondent).where(Correspondent.slug == slug)).scalar_one_or_none()
-                if corr is None:
-                    corr = Correspondent(name=result.correspondent, slug=slug)
-                    session.add(corr)
-                    session.flush()
-                doc.correspondent_id = corr.id
-
-            # Tags
+                doc.correspondent_id = _ids_by_slug(session, Correspondent, {slug: result.correspondent})[slug]
+
+            # Tags: resolve every slug at once, then link them in one INSERT
+            wanted = {}
             for tag_name in result.tags:
                 slug = _slugify(tag_name)
-                if not slug:
-                    continue
-                tag = session.execute(select(Tag).where(Tag.slug == slug)).scalar_one_or_none()
-                if tag is None:
-                    tag = Tag(name=tag_name, slug=slug, color="#3b82f6")
-                    session.add(tag)
-                    session.flush()
-                # Check if association exists
-                existing_assoc = session.execute(
-                    select(DocumentTag).where(
-                        DocumentTag.document_id == doc_uuid,
-                        DocumentTag.tag_id == tag.id,
-                    )
-                ).scalar_one_or_none()
-                if existing_assoc is None:
-                    session.add(DocumentTag(document_id=doc_uuid, tag_id=tag.id))
-                    session.flush()
-
-            session.flush()
+                if slug:
+                    wanted.setdefault(slug, tag_name)
+            if wanted:
+                tag_ids = _ids_by_slug(session, Tag, wanted, color="#3b82f6")
+                session.execute(
+                    pg_insert(DocumentTag.__table__)
+                    .values([{"document_id": doc_uuid, "tag_id": tag_id} for tag_id in tag_ids.values()])
+                    .on_conflict_do_nothing()
+                )
+
             _log_step(session, doc_uuid, "classify", "success", f"Title: {result.title}")
         except Exception as e:
             logger.exception("Classification failed for %s", document_id)
             _log_step(session, doc_uuid, "classify", "error", str(e))
             # Non-fatal: continue processing
 
-        # ── Step 3: Field Extraction ────────────────────────────────────────
         try:
-            from app.services.fields import FieldExtractor
-            extractor = FieldExtractor()
-            fields = extractor.extract_fields(text)
-            for field in fields:
-                cf = CustomField(
-                    document_id=doc_uuid,
-                    field_name=field.name,
-                    field_value=field.value,
-                    field_type=field.type,
-                )
-                session.add(cf)
-            session.flush()
+            if extracted_fields is None:
+                from app.services.fields import FieldExtractor
+                extracted_fields = FieldExtractor().extract_fields(text)
+            fields = extracted_fields
+            _insert_fields(session, doc_uuid, fields)
             _log_step(session, doc_uuid, "fields", "success", f"Extracted {len(fields)} fields")
         except Exception as e:
             logger.exception("Field extraction failed for %s", document_id)
             _log_step(session, doc_uuid, "fields", "error", str(e))
 
-        # ── Step 4: Generate Embeddings ─────────────────────────────────────
+    _run_step(self, document_id, body)
+
+
+@celery_app.task(name="app.tasks.process.embed_document", bind=True, max_retries=3)
+def embed_document(self, document_id: str) -> None:
+    """Step 3: the document embedding."""
+
+    def body(session: Session, doc: Document) -> None:
         try:
-            from app.services.embeddings import EmbeddingService
-            emb_service = EmbeddingService()
-            embedding = emb_service.embed_text(text)
-            doc.embedding = embedding
-            session.flush()
-            _log_step(session, doc_uuid, "embeddings", "success", "Generated 384-dim embedding")
+            from app.services.embeddings import get_embedding_service
+            # The ndarray binds to the halfvec column without a List[float] detour
+            doc.embedding = get_embedding_service().embed_text_np(doc.content or "")
+            _log_step(session, doc.id, "embeddings", "success", "Generated 384-dim embedding")
         except Exception as e:
             logger.exception("Embedding generation failed for %s", document_id)
-            _log_step(session, doc_uuid, "embeddings", "error", str(e))
+            _log_step(session, doc.id, "embeddings", "error", str(e))
+
+    _run_step(self, document_id, body)
 
-        # ── Step 5: Generate Thumbnail ──────────────────────────────────────
-        try:
-            from app.services.pdf import PDFService
-            pdf_service = PDFService()
 
-            thumb_relative = f"{doc_uuid.hex}.png"
-            thumb_abs = os.path.join(settings.THUMBNAIL_DIR, thumb_relative)
-            os.makedirs(settings.THUMBNAIL_DIR, exist_ok=True)
+@celery_app.task(name="app.tasks.process.thumbnail_document", bind=True, max_retries=3)
+def thumbnail_document(self, document_id: str) -> None:
+    """Step 4: the thumbnail and the file's page count, size and MIME type."""
 
-            success = pdf_service.generate_thumbnail(doc.file_path, thumb_abs)
-            if success:
+    def body(session: Session, doc: Document) -> None:
+        try:
+            thumb_relative, file_info = _make_thumbnail(doc.file_path, doc.id)
+            if thumb_relative:
                 doc.thumbnail_path = thumb_relative
 
-            file_info = pdf_service.get_file_info(doc.file_path)
             doc.page_count = file_info.get("pages", 0)
             if not doc.file_size:
                 doc.file_size = file_info.get("size", 0)
             if not doc.mime_type:
                 doc.mime_type = file_info.get("mime_type", "")
 
-            session.flush()
-            _log_step(session, doc_uuid, "thumbnail", "success", "Thumbnail generated")
+            _log_step(session, doc.id, "thumbnail", "success", "Thumbnail generated")
         except Exception as e:
             logger.exception("Thumbnail generation failed for %s", document_id)
-            _log_step(session, doc_uuid, "thumbnail", "error", str(e))
+            _log_step(session, doc.id, "thumbnail", "error", str(e))
+
+    _run_step(self, document_id, body)
+
+
+@celery_app.task(name="app.tasks.process.finalize_document", bind=True, max_retries=3)
+def finalize_document(self, results: list, document_id: str) -> dict:
+    """Chord callback: mark the document done once steps 2-4 have finished."""
 
-        # ── Done ────────────────────────────────────────────────────────────
+    def body(session: Session, doc: Document) -> None:
         doc.status = DocumentStatus.done
         doc.modified_date = datetime.utcnow()
-        _log_step(session, doc_uuid, "complete", "success", "Processing complete")
-        session.commit()
+        _log_step(session, doc.id, "complete", "success", "Processing complete")
 
-        logger.info("Document %s processed successfully", document_id)
-        return {"status": "done", "document_id": document_id}
+    _run_step(self, document_id, body)
+    logger.info("Document %s processed successfully", document_id)
+    _schedule_month_counts()
 
-    except Exception as e:
-        logger.exception("Unhandled error processing document %s", document_id)
-        try:
-            doc = session.execute(select(Document).where(Document.id == doc_uuid)).scalar_one_or_none()
-            if doc:
-                doc.status = DocumentStatus.error
-                _log_step(session, doc_uuid, "fatal", "error", str(e))
-                session.commit()
-        except Exception:
-            session.rollback()
-        raise self.retry(exc=e, countdown=60)
-    finally:
-        session.close()
+    return {"status": "done", "document_id": document_id}
 
 
 @celery_app.task(name="app.tasks.process.reprocess_document", bind=True, max_retries=3)
 def reprocess_document(self, document_id: str) -> dict:
     """Re-run AI analysis on a document that already has extracted text."""
     doc_uuid = uuid.UUID(document_id)
-    session = _get_sync_session()
+    session = SessionLocal()
 
     try:
         doc = session.execute(select(Document).where(Document.id == doc_uuid)).scalar_one_or_none()
@@ -250,7 +410,6 @@ def reprocess_document(self, document_id: str) -> dict:
             return {"status": "error", "message": "Document not found"}
 
         doc.status = DocumentStatus.processing
-        session.flush()
         _log_step(session, doc_uuid, "reprocess_start", "info", "Reprocessing started")
 
         text = doc.content or ""
@@ -262,20 +421,27 @@ def reprocess_document(self, document_id: str) -> dict:
                 ocr = OCRService()
                 text = ocr.extract_text(doc.file_path)
                 doc.content = text
-                session.flush()
             except Exception as e:
                 logger.exception("Re-OCR failed: %s", e)
 
+        from app.services.embeddings import get_embedding_service
+        embedding_future = _step_pool.submit(get_embedding_service().embed_text_np, text)
+
+        extracted_fields = None
+
         # Re-classify
         try:
-            from app.services.classifier import ClassifierService
-            classifier = ClassifierService()
+            from app.services.extraction import ExtractionService
+            extraction_service = ExtractionService()
 
-            existing_tags = [t.name for t in session.execute(select(Tag)).scalars().all()]
-            existing_types = [t.name for t in session.execute(select(DocumentType)).scalars().all()]
-            existing_corr = [c.name for c in session.execute(select(Correspondent)).scalars().all()]
+            existing_tags = _existing_names(session, Tag)
+            existing_types = _existing_names(session, DocumentType)
+            existing_corr = _existing_names(session, Correspondent)
 
-            result = classifier.classify(text, existing_tags, existing_types, existing_corr)
+            # One LLM call returns the classification and the fields together
+            extraction = extraction_service.extract_all(text, existing_tags, existing_types, existing_corr)
+            result = extraction.classification
+            extracted_fields = extraction.fields
 
             if result.title:
                 doc.title = result.title
@@ -291,23 +457,14 @@ def reprocess_document(self, document_id: str) -> dict:
             _log_step(session, doc_uuid, "reclassify", "error", str(e))
 
         # Re-extract fields: remove old ones first
-        old_fields = session.execute(select(CustomField).where(CustomField.document_id == doc_uuid)).scalars().all()
-        for cf in old_fields:
-            session.delete(cf)
-        session.flush()
+        session.execute(CustomField.__table__.delete().where(CustomField.document_id == doc_uuid))
 
         try:
-            from app.services.fields import FieldExtractor
-            extractor = FieldExtractor()
-            fields = extractor.extract_fields(text)
-            for field in fields:
-                session.add(CustomField(
-                    document_id=doc_uuid,
-                    field_name=field.name,
-                    field_value=field.value,
-                    field_type=field.type,
-                ))
-            session.flush()
+            if extracted_fields is None:
+                from app.services.fields import FieldExtractor
+                extracted_fields = FieldExtractor().extract_fields(text)
+            fields = extracted_fields
+            _insert_fields(session, doc_uuid, fields)
             _log_step(session, doc_uuid, "reextract_fields", "success", f"{len(fields)} fields")
         except Exception as e:
             logger.exception("Field re-extraction failed: %s", e)
@@ -315,10 +472,7 @@ def reprocess_document(self, document_id: str) -> dict:
 
         # Re-generate embeddings
         try:
-            from app.services.embeddings import EmbeddingService
-            emb_service = EmbeddingService()
-            doc.embedding = emb_service.embed_text(text)
-            session.flush()
+            doc.embedding = embedding_future.result()
             _log_step(session, doc_uuid, "reembed", "success", "Embedding regenerated")
         except Exception as e:
             logger.exception("Re-embedding failed: %s", e)
@@ -327,7 +481,7 @@ def reprocess_document(self, document_id: str) -> dict:
         doc.status = DocumentStatus.done
         doc.modified_date = datetime.utcnow()
         _log_step(session, doc_uuid, "reprocess_complete", "success", "Reprocessing complete")
-        session.commit()
+        _commit(session)
 
         return {"status": "done", "document_id": document_id}
 
@@ -337,9 +491,16 @@ def reprocess_document(self, document_id: str) -> dict:
             doc = session.execute(select(Document).where(Document.id == doc_uuid)).scalar_one_or_none()
             if doc:
                 doc.status = DocumentStatus.error
-                session.commit()
+                _commit(session)
         except Exception:
             session.rollback()
         raise self.retry(exc=e, countdown=60)
     finally:
         session.close()
+
+
+@celery_app.task(name="app.tasks.process.refresh_month_counts")
+def refresh_month_counts() -> None:
+    """Rebuild the per-month document counts shown on the dashboard."""
+    clear_pending_refresh()
+    _refresh_month_counts()
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Optional
+
+_DECODER = json.JSONDecoder()
+
+
+def parse_json_object(raw: str) -> Optional[Dict[str, Any]]:
+    """Parse the JSON object in an LLM response, tolerating text around it.
+
+    Tries the whole string first, then decodes from the first ``{`` and
+    ignores whatever trails the object. Returns None when nothing parses.
+    """
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        start = raw.find("{")
+        if start < 0:
+            return None
+        try:
+            # Single linear pass; stops at the end of the first object
+            data, _ = _DECODER.raw_decode(raw, start)
+        except json.JSONDecodeError:
+            return None
+    return data if isinstance(data, dict) else None
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def get_magic():
+    """One libmagic handle per process, or None when libmagic is missing.
+
+    Opening a handle parses the magic database, so it is done once; Magic
+    serializes calls with its own lock, so the handle is shared by threads.
+    """
+    try:
+        import magic
+        return magic.Magic(mime=True)
+    except Exception as e:
+        logger.warning("libmagic unavailable, falling back to other mime detection: %s", e)
+        return None
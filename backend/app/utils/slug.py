@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import re
+
+_PAT_NONWORD = re.compile(r"[^\w\s-]")
+_PAT_SPACE = re.compile(r"[\s_]+")
+_PAT_DASH = re.compile(r"-+")
+
+# ASCII fast path: a single C-level pass drops punctuation and turns
+# whitespace and underscores into dashes.
+_ASCII = [chr(i) for i in range(128)]
+_TABLE = str.maketrans(
+    {c: None for c in _ASCII if not (c.isalnum() or c.isspace() or c in "-_")}
+    | {c: "-" for c in _ASCII if c.isspace() or c == "_"}
+)
+
+
+def slugify(name: str) -> str:
+    """Lower-case ``name`` and reduce it to word characters joined by dashes."""
+    slug = name.lower()
+    if slug.isascii():
+        slug = slug.translate(_TABLE)
+        # Runs are short in names, so this beats a regex substitution
+        while "--" in slug:
+            slug = slug.replace("--", "-")
+        return slug.strip("-")
+    # Unicode letters and punctuation need the regex character classes
+    slug = _PAT_NONWORD.sub("", slug.strip())
+    slug = _PAT_SPACE.sub("-", slug)
+    return _PAT_DASH.sub("-", slug).strip("-")
@@ -23,7 +23,13 @@ celery_app.conf.update(
     enable_utc=True,
     task_track_started=True,
     task_acks_late=True,
+    # Workers on the default queue raise this with --prefetch-multiplier;
+    # OCR tasks are long, so the ocr worker reserves one at a time
     worker_prefetch_multiplier=1,
+    # CPU-heavy OCR gets its own workers so it cannot starve the light steps
+    task_routes={
+        "app.tasks.process.ocr_document": {"queue": "ocr"},
+    },
     result_expires=86400,  # 24 hours
     broker_connection_retry_on_startup=True,
 )
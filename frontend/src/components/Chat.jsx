@@ -9,7 +9,6 @@ import {
   Sparkles,
   MessageSquare,
 } from 'lucide-react';
-import api from '../api';
 
 function ChatMessage({ message }) {
   const isUser = message.role === 'user';
@@ -77,24 +76,61 @@ export default function Chat() {
     setInput('');
     setLoading(true);
 
+    // Append to the last (assistant) message as events arrive
+    const updateReply = (patch) =>
+      setMessages((prev) => {
+        const last = prev[prev.length - 1];
+        return [...prev.slice(0, -1), { ...last, ...patch(last) }];
+      });
+
+    const errorText = 'Sorry, I encountered an error. Please try again.';
+    let replyStarted = false;
+
     try {
-      const res = await api.post('/chat', { question });
-      const data = res.data;
-      const aiMessage = {
-        role: 'assistant',
-        content: data.answer || data.response || data.message || 'No response received.',
-        sources: data.sources || data.documents || [],
-      };
-      setMessages((prev) => [...prev, aiMessage]);
+      const res = await fetch('/api/chat/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ question }),
+      });
+      if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+      setMessages((prev) => [...prev, { role: 'assistant', content: '', sources: [] }]);
+      replyStarted = true;
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const raw of events) {
+          if (!raw.startsWith('data: ')) continue;
+          const event = JSON.parse(raw.slice(6));
+          if (event.type === 'sources') {
+            updateReply(() => ({ sources: event.sources }));
+          } else if (event.type === 'token') {
+            updateReply((last) => ({ content: last.content + event.text }));
+          }
+        }
+      }
     } catch (err) {
-      setMessages((prev) => [
-        ...prev,
-        {
-          role: 'assistant',
-          content: 'Sorry, I encountered an error. Please try again.',
-          sources: [],
-        },
-      ]);
+      if (replyStarted) {
+        // Keep whatever streamed before the failure in the same bubble
+        updateReply((last) => ({
+          content: last.content ? `${last.content}\n\n${errorText}` : errorText,
+        }));
+      } else {
+        setMessages((prev) => [
+          ...prev,
+          {
+            role: 'assistant',
+            content: errorText,
+            sources: [],
+          },
+        ]);
+      }
     } finally {
       setLoading(false);
       inputRef.current?.focus();